@@ -1,9 +1,18 @@
 
+import os
+import sys
+import json
+import mmap
+import struct
+import hashlib
+from array import array
+from typing import Sequence, Iterable
 from math import sqrt, floor, ceil
-from itertools import chain
+from itertools import chain, islice
 import matplotlib.pyplot as plt
 from networkx import Graph, circular_layout, bipartite_layout, spring_layout, draw_networkx_edge_labels, \
     draw as draw_graph, read_gexf, write_gexf
+from Graphing import NodeType, EdgeType, SwapProgress, search_edge_swaps
 
 
 def display_graphs (*graphs:Graph, labels:list[str]|None=None):
@@ -67,3 +76,232 @@ def save_graph (G:Graph, name:str) -> str:
     s :str = f"TestGraphs/{name}.gexf"
     write_gexf(G, s)
     return s
+
+CHECKPOINT_MAGIC = b"SWAPCKP2"
+_CHECKPOINT_HEADER = struct.Struct("<8s32sQQQQQ")
+
+def get_pair_fingerprint (G1:Graph, G2:Graph) -> bytes:
+    "Returns a hash of the node counts, edge counts and sorted edges of both graphs, to tell which pair a checkpoint belongs to"
+    digest = hashlib.sha256()
+    for G in (G1, G2):
+        digest.update(struct.pack("<QQ", G.number_of_nodes(), G.number_of_edges()))
+        for edge in sorted(repr(sorted((u, v), key=repr)) for u,v in G.edges):
+            digest.update(edge.encode() + b"\n")
+    return digest.digest()
+
+def _write_ints (fout, values:Iterable[int]):
+    "Writes ints as little endian int32s, a chunk at a time"
+    values = iter(values)
+    while chunk := array('i', islice(values, 65536)):
+        if sys.byteorder == 'big': chunk.byteswap()
+        chunk.tofile(fout)
+
+def save_checkpoint (progress:SwapProgress, path:str, *, fingerprint:bytes, nodeLabels:Sequence[NodeType]) -> str:
+    """Saves the state of a swap search for the pair with the given `get_pair_fingerprint`.
+    The delta from `G1` to the search's working graph is the ordered swaps themselves, which are replayed when resuming.
+
+    Like `save_swap_plan`, the file is a header, a json list of `nodeLabels`, then rows of int32 label positions:
+    four per ordered swap, four per deferred swap, (node, degree) for each node of the remaining difference graph,
+    then (neighbour, 0 if red else 1) for each of their neighbours, in order.
+    The file is written beside `path` then moved over it, so a crash never leaves a half written checkpoint."""
+    index = {n: i for i,n in enumerate(nodeLabels)}
+    remaining = progress.remaining
+    labelTable = json.dumps(list(nodeLabels)).encode()
+    labelTable += b" " * (-(_CHECKPOINT_HEADER.size + len(labelTable)) % 8)
+    tmpPath = path + ".tmp"
+    with open(tmpPath, 'wb') as fout:
+        fout.write(_CHECKPOINT_HEADER.pack(
+            CHECKPOINT_MAGIC, fingerprint, len(labelTable), len(progress.swaps), len(progress.deferred),
+            remaining.number_of_nodes(), 2 * remaining.number_of_edges()
+        ))
+        fout.write(labelTable)
+        for swaps in (progress.swaps, progress.deferred):
+            _write_ints(fout, (index[n] for (a, b), (c, d) in swaps for n in (a, b, c, d)))
+        _write_ints(fout, (k for n, neighbours in remaining.adj.items() for k in (index[n], len(neighbours))))
+        _write_ints(fout, (
+            k for neighbours in remaining.adj.values()
+            for v, data in neighbours.items() for k in (index[v], 0 if data['color'] == 'red' else 1)
+        ))
+        fout.flush()
+        os.fsync(fout.fileno())
+    os.replace(tmpPath, path)
+    return path
+
+def load_checkpoint (path:str, *, fingerprint:bytes|None=None) -> SwapProgress:
+    """Loads a checkpoint saved by `save_checkpoint`, raising a ValueError if it isn't one,
+    or if it belongs to a different pair than the given `fingerprint`"""
+    with open(path, 'rb') as fin:
+        data = fin.read()
+    if len(data) < _CHECKPOINT_HEADER.size:
+        raise ValueError(f"'{path}' is not a checkpoint")
+    magic, savedFingerprint, labelBytes, orderedCount, deferredCount, nodeCount, adjacencyCount = _CHECKPOINT_HEADER.unpack_from(data)
+    if magic != CHECKPOINT_MAGIC:
+        raise ValueError(f"'{path}' is not a checkpoint")
+    if fingerprint is not None and fingerprint != savedFingerprint:
+        raise ValueError(f"Checkpoint '{path}' belongs to a different pair of graphs")
+    start = _CHECKPOINT_HEADER.size + labelBytes
+    swapInts = 4 * (orderedCount + deferredCount)
+    adjacencyStart = swapInts + 2 * nodeCount
+    # Every count is checked against the file before anything is read with it, so a truncated or corrupt file is a ValueError
+    if len(data) - start != 4 * (adjacencyStart + 2 * adjacencyCount):
+        raise ValueError(f"Checkpoint '{path}' is corrupt")
+    try:
+        labels :list[NodeType] = json.loads(data[_CHECKPOINT_HEADER.size:start])
+    except ValueError:
+        raise ValueError(f"Checkpoint '{path}' is corrupt") from None
+    ints = array('i', data[start:])
+    if sys.byteorder == 'big': ints.byteswap()
+    positions = chain(ints[:swapInts], ints[swapInts:adjacencyStart:2], ints[adjacencyStart::2])
+    degrees = ints[swapInts+1:adjacencyStart:2]
+    if not isinstance(labels, list) or not all(0 <= i < len(labels) for i in positions) \
+    or min(degrees, default=0) < 0 or sum(degrees) != adjacencyCount \
+    or not set(ints[adjacencyStart::2]) <= set(ints[swapInts:adjacencyStart:2]):
+        raise ValueError(f"Checkpoint '{path}' is corrupt")
+    def read_swaps (offset:int, count:int) -> list[tuple[EdgeType,EdgeType]]:
+        return [
+            ((labels[ints[k]], labels[ints[k+1]]), (labels[ints[k+2]], labels[ints[k+3]]))
+            for k in range(offset, offset + 4 * count, 4)
+        ]
+    swaps = read_swaps(0, orderedCount)
+    deferred = read_swaps(4 * orderedCount, deferredCount)
+    # Neighbours are put back directly so each node's neighbour order, which the search depends on, is exactly as saved
+    remaining = Graph()
+    nodeRows = range(swapInts, adjacencyStart, 2)
+    remaining.add_nodes_from(labels[ints[i]] for i in nodeRows)
+    k = adjacencyStart
+    for i in nodeRows:
+        u = labels[ints[i]]
+        for _ in range(ints[i+1]):
+            v = labels[ints[k]]
+            remaining._adj[u][v] = remaining._adj[v].get(u) or {'color': 'red' if ints[k+1] == 0 else 'blue'}
+            k += 2
+    return SwapProgress(swaps, deferred, remaining)
+
+def find_edge_swaps_resumable (G1:Graph, G2:Graph, path:str, *, interval:float=60.0) -> list[tuple[EdgeType,EdgeType]]:
+    """Same as `find_edge_swaps`, but saves a checkpoint to `path` about every `interval` seconds.
+    If a checkpoint from an earlier run on the same pair already exists, the search resumes from it and gives the same result
+    as an uninterrupted run, while a checkpoint from a different pair raises a ValueError.
+    The checkpoint is removed once the search is done. Node labels must be json values, like strings or ints."""
+    fingerprint = get_pair_fingerprint(G1, G2)
+    nodeLabels = list(G1.nodes)
+    # A crash part way through saving leaves the half written file behind, which is never worth keeping
+    if os.path.exists(path + ".tmp"): os.remove(path + ".tmp")
+    resume = load_checkpoint(path, fingerprint=fingerprint) if os.path.exists(path) else None
+    result = search_edge_swaps(G1, G2, resume=resume, checkpointInterval=interval,
+        checkpoint=lambda progress: save_checkpoint(progress, path, fingerprint=fingerprint, nodeLabels=nodeLabels)
+    )
+    if os.path.exists(path): os.remove(path)
+    return result.plan()
+
+SWAP_PLAN_MAGIC = b"SWAPPLN1"
+_SWAP_PLAN_HEADER = struct.Struct("<8sQQ")
+
+def save_swap_plan (swaps:Sequence[tuple[EdgeType,EdgeType]], path:str, *, nodeLabels:Sequence[NodeType]|None=None) -> str:
+    """Saves a list of swaps in a compact binary form, which `SwapPlan` can read back without loading it all.
+
+    The file is a header, then a json list of node labels, then one row of four little endian int32s per swap,
+    (e1u, e1v, e2u, e2v), holding positions in the label list. If `nodeLabels` is given it's used as the label list,
+    which lets the plan be replayed onto edge arrays with the same node indices, otherwise labels are listed in the order they appear.
+    Labels must be json values, like strings or ints."""
+    if nodeLabels is None:
+        nodeLabels = list(dict.fromkeys(n for (a, b), (c, d) in swaps for n in (a, b, c, d)))
+    index = {n: i for i,n in enumerate(nodeLabels)}
+    labelTable = json.dumps(list(nodeLabels)).encode()
+    labelTable += b" " * (-(_SWAP_PLAN_HEADER.size + len(labelTable)) % 8)
+    tmpPath = path + ".tmp"
+    with open(tmpPath, 'wb') as fout:
+        fout.write(_SWAP_PLAN_HEADER.pack(SWAP_PLAN_MAGIC, len(labelTable), len(swaps)))
+        fout.write(labelTable)
+        for start in range(0, len(swaps), 65536):
+            rows = array('i', (
+                index[n]
+                for (a, b), (c, d) in swaps[start:start+65536]
+                for n in (a, b, c, d)
+            ))
+            if sys.byteorder == 'big': rows.byteswap()
+            rows.tofile(fout)
+    os.replace(tmpPath, path)
+    return path
+
+class SwapPlan:
+    """A swap plan saved by `save_swap_plan`, memory mapped rather than read into memory.
+    - labels : The node label list
+    - swaps : A flat int view where swap i is `swaps[4*i : 4*i+4]`, as positions in `labels`
+    Close it, or use it in a `with` block, when done."""
+
+    def __init__ (self, path:str):
+        self._file = open(path, 'rb')
+        try:
+            # mmap can't map an empty file, so anything too short for a header is turned away first
+            if os.fstat(self._file.fileno()).st_size < _SWAP_PLAN_HEADER.size:
+                raise ValueError(f"'{path}' is not a swap plan")
+            self._map = mmap.mmap(self._file.fileno(), 0, access=mmap.ACCESS_READ)
+            magic, labelBytes, self.count = _SWAP_PLAN_HEADER.unpack_from(self._map)
+            if magic != SWAP_PLAN_MAGIC:
+                raise ValueError(f"'{path}' is not a swap plan")
+            start = _SWAP_PLAN_HEADER.size + labelBytes
+            if len(self._map) < start + 16 * self.count:
+                raise ValueError(f"Swap plan '{path}' is truncated")
+            try:
+                self.labels :list[NodeType] = json.loads(self._map[_SWAP_PLAN_HEADER.size:start])
+            except ValueError:
+                raise ValueError(f"Swap plan '{path}' is corrupt") from None
+            if sys.byteorder == 'big':
+                self.swaps = array('i', self._map[start:start + 16 * self.count])
+                self.swaps.byteswap()
+            else:
+                self.swaps = memoryview(self._map)[start:start + 16 * self.count].cast('i')
+        except Exception:
+            self.close()
+            raise
+
+    def __len__ (self) -> int: return self.count
+
+    def __getitem__ (self, i:int) -> tuple[EdgeType, EdgeType]:
+        a, b, c, d = (self.labels[k] for k in self.swaps[4*i:4*i+4])
+        return ((a, b), (c, d))
+
+    def close (self):
+        if isinstance(getattr(self, 'swaps', None), memoryview): self.swaps.release()
+        if hasattr(self, '_map'): self._map.close()
+        self._file.close()
+
+    def __enter__ (self): return self
+
+    def __exit__ (self, *_): self.close()
+
+def replay_swap_plan (G:Graph, plan:SwapPlan, start:int=0, stop:int|None=None):
+    "Applies swaps `start` to `stop` of the plan to `G`, the same as `swap_edges`"
+    labels, swaps = plan.labels, plan.swaps
+    for k in range(4 * start, 4 * (len(plan) if stop is None else stop), 4):
+        a, b, c, d = labels[swaps[k]], labels[swaps[k+1]], labels[swaps[k+2]], labels[swaps[k+3]]
+        G.remove_edge(a, b)
+        G.remove_edge(c, d)
+        G.add_edge(a, c)
+        G.add_edge(b, d)
+
+def replay_swap_plan_edges (edges:array, nodeCount:int, plan:SwapPlan, start:int=0, stop:int|None=None):
+    """Applies swaps `start` to `stop` of the plan to a flat edge array, like those from `Graphing.generate_realizations`,
+    where the plan's node labels are the array's node indices, raising a ValueError if any label isn't one"""
+    labels = plan.labels
+    if not all(type(n) is int and 0 <= n < nodeCount for n in labels):
+        raise ValueError(f"The plan's node labels must all be node indices below {nodeCount}")
+    slots :dict[int, int] = {
+        (u * nodeCount + v if u < v else v * nodeCount + u): i
+        for i, u, v in zip(range(0, len(edges), 2), edges[::2], edges[1::2])
+    }
+    swaps = plan.swaps
+    for k in range(4 * start, 4 * (len(plan) if stop is None else stop), 4):
+        a, b, c, d = labels[swaps[k]], labels[swaps[k+1]], labels[swaps[k+2]], labels[swaps[k+3]]
+        k1 = a * nodeCount + c if a < c else c * nodeCount + a
+        k2 = b * nodeCount + d if b < d else d * nodeCount + b
+        if k1 in slots or k2 in slots:
+            raise ValueError(f"Swap {k//4} would add an edge that already exists")
+        try:
+            i = slots.pop(a * nodeCount + b if a < b else b * nodeCount + a)
+            j = slots.pop(c * nodeCount + d if c < d else d * nodeCount + c)
+        except KeyError:
+            raise ValueError(f"Swap {k//4} removes an edge that doesn't exist") from None
+        edges[i], edges[i+1] = a, c
+        edges[j], edges[j+1] = b, d
+        slots[k1], slots[k2] = i, j
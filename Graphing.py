@@ -1,8 +1,12 @@
 
-from typing import Hashable, Sequence, Iterable
-from random import randint
-from itertools import pairwise
-from networkx import Graph, DiGraph, empty_graph, difference
+from typing import Hashable, Sequence, Iterable, Iterator, Callable, NamedTuple
+from array import array
+from copy import deepcopy
+from concurrent.futures import ProcessPoolExecutor
+from random import randint, Random, getrandbits
+from itertools import pairwise, islice
+from time import perf_counter
+from networkx import Graph, DiGraph, empty_graph, difference, is_valid_degree_sequence_erdos_gallai as is_valid_degree_sequence
 
 NodeType = Hashable
 EdgeType = tuple[NodeType, NodeType]
@@ -33,6 +37,140 @@ def construct_graph (degreeSequence:Sequence[int], *, nodeLabels:Sequence[NodeTy
         nodeDegrees.sort(key=lambda x:x[1], reverse=True)
     return G
 
+def _realize_chunk (degreeSequence:list[int], seed:int, start:int, stop:int) -> list[array]:
+    """Builds realizations `start` to `stop` of an already validated degree sequence,
+    using the same randomized Havel-Hakimi steps as `construct_graph`.
+    Realization i always uses its own generator seeded from (`seed`, i), so results don't depend on how they're split up."""
+    n = len(degreeSequence)
+    edgeCount = sum(degreeSequence) // 2
+    # Node indices sorted by degree once, then copied into the same buffers for every realization
+    template = sorted(range(n), key=degreeSequence.__getitem__, reverse=True)
+    order :list[int] = []
+    remaining :list[int] = []
+    realizations :list[array] = []
+    for i in range(start, stop):
+        rng = Random(f"{seed}:{i}")
+        order[:] = template
+        remaining[:] = degreeSequence
+        edges = array('i', [0]) * (2 * edgeCount)
+        e = 0
+        while order:
+            k = order.pop(rng.randrange(len(order)))
+            for j in range(remaining[k]):
+                edges[e], edges[e+1] = k, order[j]
+                e += 2
+                remaining[order[j]] -= 1
+            remaining[k] = 0
+            order.sort(key=remaining.__getitem__, reverse=True)
+        realizations.append(edges)
+    return realizations
+
+def generate_realizations (degreeSequence:Sequence[int], count:int, *, seed:int|None=None,
+    processes:int=1, chunkSize:int=64
+) -> Iterator[array]:
+    """Yields `count` random graphs of the given degree sequence, like calling `construct_graph` `count` times,
+    but the sequence is validated and sorted only once. Each graph is a flat array of node indices,
+    where edge i is (`edges[2*i]`, `edges[2*i+1]`), see `realization_to_graph`.
+
+    The same `seed` always gives the same graphs, and with `processes` > 1 the graphs are built
+    in chunks of `chunkSize` across that many processes, still yielded in order."""
+    degrees = list(degreeSequence)
+    if not is_valid_degree_sequence(degrees):
+        raise ValueError("Degree sequence forms an invalid graph: "+str(degreeSequence))
+    if seed is None: seed = getrandbits(64)
+    chunks = [(i, min(i + chunkSize, count)) for i in range(0, count, chunkSize)]
+    if processes <= 1:
+        for start, stop in chunks:
+            yield from _realize_chunk(degrees, seed, start, stop)
+        return
+    with ProcessPoolExecutor(processes) as pool:
+        for realizations in pool.map(_realize_chunk, *zip(*[(degrees, seed, start, stop) for start, stop in chunks])):
+            yield from realizations
+
+def realization_to_graph (edges:array, nodeCount:int, *, nodeLabels:Sequence[NodeType]|None=None) -> Graph:
+    "Builds the graph of one realization from `generate_realizations`, optionally relabelling node i as `nodeLabels[i]`"
+    if nodeLabels is not None and len(nodeLabels) < nodeCount:
+        raise ValueError("nodeLabels must be of equal or greater length than degreeSequence")
+    labels :Sequence[NodeType] = nodeLabels[:nodeCount] if nodeLabels is not None else range(nodeCount)
+    G :Graph = empty_graph(labels)
+    G.add_edges_from((labels[edges[i]], labels[edges[i+1]]) for i in range(0, len(edges), 2))
+    return G
+
+def run_switch_chain (edges:array, nodeCount:int, switches:int, rng:Random) -> int:
+    """Runs `switches` steps of the edge switch Markov chain on a flat edge array from `generate_realizations`, in place.
+    Returns how many steps were accepted.
+
+    Each step picks two edges (a,b) and (c,d), and one of the two ways to rewire them, then swaps them to (a,c) and (b,d)
+    like `swap_edges`, unless that would make a self loop or an edge that already exists.
+    Rejected steps leave the graph as is, which keeps the chain uniform over all realizations of the degree sequence."""
+    edgeCount = len(edges) // 2
+    if edgeCount < 2: return 0
+    random = rng.random
+    # Every edge as a single int, smaller node first, for constant time membership checks
+    present :set[int] = {
+        min(edges[i], edges[i+1]) * nodeCount + max(edges[i], edges[i+1])
+        for i in range(0, len(edges), 2)
+    }
+    accepted = 0
+    for _ in range(switches):
+        i = int(random() * edgeCount) * 2
+        j = int(random() * edgeCount) * 2
+        if i == j: continue
+        a, b = edges[i], edges[i+1]
+        c, d = edges[j], edges[j+1]
+        if random() < 0.5: c, d = d, c
+        if a == c or b == d: continue
+        k1 = a * nodeCount + c if a < c else c * nodeCount + a
+        k2 = b * nodeCount + d if b < d else d * nodeCount + b
+        if k1 in present or k2 in present: continue
+        present.remove(a * nodeCount + b if a < b else b * nodeCount + a)
+        present.remove(c * nodeCount + d if c < d else d * nodeCount + c)
+        present.add(k1)
+        present.add(k2)
+        edges[i+1], edges[j] = c, b
+        edges[j+1] = d
+        accepted += 1
+    return accepted
+
+def _sample_chain (degreeSequence:list[int], seed:int, chain:int, samples:int, burnIn:int, thinning:int) -> list[array]:
+    "Runs one chain of `sample_realizations`, starting from realization `chain` of `generate_realizations`"
+    rng = Random(f"{seed}:chain{chain}")
+    edges = _realize_chunk(degreeSequence, seed, chain, chain + 1)[0]
+    run_switch_chain(edges, len(degreeSequence), burnIn, rng)
+    realizations :list[array] = []
+    for _ in range(samples):
+        run_switch_chain(edges, len(degreeSequence), thinning, rng)
+        realizations.append(array('i', edges))
+    return realizations
+
+def sample_realizations (degreeSequence:Sequence[int], count:int, *, burnIn:int|None=None, thinning:int|None=None,
+    seed:int|None=None, chains:int=1, processes:int=1
+) -> Iterator[array]:
+    """Yields `count` near uniform random graphs of the given degree sequence, in the same form as `generate_realizations`.
+    Unlike `construct_graph`, the graphs aren't biased by the Havel-Hakimi construction, since they come from `run_switch_chain`.
+
+    Each of the `chains` independent chains runs `burnIn` switch steps (default 10 per edge),
+    then takes a sample every `thinning` steps (default 1 per edge). Samples are yielded chain by chain,
+    and with `processes` > 1 the chains run in parallel. The same `seed` always gives the same graphs."""
+    degrees = list(degreeSequence)
+    if not is_valid_degree_sequence(degrees):
+        raise ValueError("Degree sequence forms an invalid graph: "+str(degreeSequence))
+    if seed is None: seed = getrandbits(64)
+    edgeCount = sum(degrees) // 2
+    if burnIn is None: burnIn = 10 * edgeCount
+    if thinning is None: thinning = edgeCount
+    jobs = [
+        (degrees, seed, c, count // chains + (c < count % chains), burnIn, thinning)
+        for c in range(chains)
+    ]
+    if processes <= 1:
+        for job in jobs:
+            yield from _sample_chain(*job)
+        return
+    with ProcessPoolExecutor(processes) as pool:
+        for realizations in pool.map(_sample_chain, *zip(*jobs)):
+            yield from realizations
+
 def create_cycle_graph (cycle:list[NodeType]) -> DiGraph:
     CG :DiGraph = empty_graph(cycle, DiGraph)
     if len(cycle)==0: return CG
@@ -58,6 +196,89 @@ def get_difference_graph (G1:Graph, G2:Graph) -> Graph:
         DG.add_edge(u, v, color='blue')
     return DG
 
+class EdgeIndex:
+    """Indexes the edges of a reference graph `G1` once, as a set of ints, so that its difference
+    with many other graphs on the same nodes can be found with plain set operations.
+    Edge (u,v) is stored as `i*n + j`, where i < j are the positions of u and v in `G1.nodes`."""
+
+    def __init__ (self, G1:Graph):
+        self.nodes :list[NodeType] = list(G1.nodes)
+        self.nodeIndex :dict[NodeType, int] = {n: i for i,n in enumerate(self.nodes)}
+        self.keys :frozenset[int] = frozenset(self.encode(G1.edges))
+
+    def encode (self, edges:Iterable[EdgeType]) -> set[int]:
+        n = len(self.nodes)
+        index = self.nodeIndex
+        try:
+            return {
+                i * n + j if i < j else j * n + i
+                for i, j in ((index[u], index[v]) for u,v in edges)
+            }
+        except KeyError as err:
+            raise ValueError(f"Node {err} is not in the indexed graph") from None
+
+    def decode (self, keys:Iterable[int]) -> list[EdgeType]:
+        n = len(self.nodes)
+        return [(self.nodes[k // n], self.nodes[k % n]) for k in keys]
+
+    def difference (self, G2:Graph) -> tuple[list[EdgeType], list[EdgeType]]:
+        """Returns (`red`, `blue`), the edges in `G1` but not `G2`, and the edges in `G2` but not `G1`,
+        the same edges as `get_difference_graph`"""
+        keys = self.encode(G2.edges)
+        return self.decode(self.keys - keys), self.decode(keys - self.keys)
+
+    def difference_graph (self, G2:Graph) -> Graph:
+        "Returns the same graph as `get_difference_graph`"
+        red, blue = self.difference(G2)
+        DG :Graph = empty_graph(self.nodes)
+        DG.graph['name'] = "Difference"
+        DG.add_edges_from(red, color='red')
+        DG.add_edges_from(blue, color='blue')
+        return DG
+
+    def differences (self, candidates:Iterable[Graph], *, processes:int=1, chunkSize:int=16
+    ) -> Iterator[tuple[list[EdgeType], list[EdgeType]]]:
+        """Yields `difference` against each candidate in turn. With `processes` > 1 the candidates are compared
+        in that many processes, each of which receives the index only once.
+        Candidates are read a window of `chunkSize`*`processes` at a time, with the next window sent off while the
+        current one is yielded, so a long or endless stream of candidates is never held in memory all at once."""
+        if processes <= 1:
+            for G2 in candidates:
+                yield self.difference(G2)
+            return
+        candidates = iter(candidates)
+        with ProcessPoolExecutor(processes, initializer=_set_edge_index, initargs=(self,)) as pool:
+            def send_window () -> Iterator[tuple[list[EdgeType], list[EdgeType]]] | None:
+                window = [list(G2.edges) for G2 in islice(candidates, chunkSize * processes)]
+                return pool.map(_edge_index_difference, window, chunksize=chunkSize) if window else None
+            current = send_window()
+            while current is not None:
+                ahead = send_window()
+                yield from current
+                current = ahead
+
+_edgeIndex :EdgeIndex|None = None
+
+def _set_edge_index (index:EdgeIndex):
+    global _edgeIndex
+    _edgeIndex = index
+
+def _edge_index_difference (edges:list[EdgeType]) -> tuple[list[EdgeType], list[EdgeType]]:
+    keys = _edgeIndex.encode(edges)
+    return _edgeIndex.decode(_edgeIndex.keys - keys), _edgeIndex.decode(keys - _edgeIndex.keys)
+
+def get_pairwise_difference_sizes (graphs:Sequence[Graph]) -> list[list[int]]:
+    """Returns a matrix where entry [i][j] is the number of edges in the difference graph of `graphs[i]` and `graphs[j]`.
+    All graphs must have the same nodes."""
+    if len(graphs) == 0: return []
+    index = EdgeIndex(graphs[0])
+    keys = [index.encode(G.edges) for G in graphs]
+    sizes = [[0] * len(graphs) for _ in graphs]
+    for i in range(len(graphs)):
+        for j in range(i+1, len(graphs)):
+            sizes[i][j] = sizes[j][i] = len(keys[i] ^ keys[j])
+    return sizes
+
 def get_components (G:Graph) -> Iterable[list[NodeType]]:
     """Returns a generator that yields lists of nodes, or more generally, the components of the given graph.
     Generator returns number of components yielded when iteration stops."""
@@ -76,26 +297,82 @@ def get_components (G:Graph) -> Iterable[list[NodeType]]:
             componentCount += 1
             if len(notVisited)==0: return
 
-def find_alternating_cycles (G1:Graph, G2:Graph) -> list[list[NodeType]]:
-    "Returns a list of alternating cycles, always starting from an edge *to be added*"
-    cycles :list[list[NodeType]] = []
-    toAdd :Graph = difference(G2, G1)
-    toRemove :Graph = difference(G1, G2)
-    nodes = list(G1.nodes)
-    while nodes and (start := nodes.pop()):
+class SearchBudget:
+    """Decides when an anytime search should stop: once `cancel()` returns true,
+    `timeBudget` seconds have passed, or `maxIterations` steps have been taken"""
+
+    def __init__ (self, cancel:Callable[[],bool]|None=None, timeBudget:float|None=None, maxIterations:int|None=None):
+        self.cancel = cancel
+        self.deadline = None if timeBudget is None else perf_counter() + timeBudget
+        self.maxIterations = maxIterations
+        self.iterations :int = 0
+
+    def exhausted (self) -> bool:
+        "Counts one step, and returns whether the search should stop before taking it"
+        self.iterations += 1
+        return (self.maxIterations is not None and self.iterations > self.maxIterations) \
+            or (self.deadline is not None and perf_counter() > self.deadline) \
+            or (self.cancel is not None and self.cancel())
+
+class CycleProgress (NamedTuple):
+    """The result of `search_alternating_cycles`, which may be partial.
+    - cycles : The alternating cycles found so far
+    - remaining : The difference edges not in any of those cycles, coloured like `get_difference_graph`"""
+    cycles :list[list[NodeType]]
+    remaining :Graph
+
+    @property
+    def complete (self) -> bool: return self.remaining.number_of_edges() == 0
+
+def search_alternating_cycles (G1:Graph, G2:Graph, *, resume:CycleProgress|None=None,
+    cancel:Callable[[],bool]|None=None, timeBudget:float|None=None, maxIterations:int|None=None,
+    progress:Callable[[int,int],None]|None=None
+) -> CycleProgress:
+    """Anytime version of `find_alternating_cycles`, which stops early once its `SearchBudget` runs out,
+    and can continue from an earlier partial result with `resume`.
+    `progress` is called after each step with the number of remaining difference edges and cycles found."""
+    if resume is None:
+        cycles :list[list[NodeType]] = []
+        toAdd :Graph = difference(G2, G1)
+        toRemove :Graph = difference(G1, G2)
+        nodes = list(G1.nodes)
+    else:
+        cycles = list(resume.cycles)
+        toAdd, toRemove = Graph(), Graph()
+        for u,v,c in resume.remaining.edges.data('color'):
+            (toAdd if c == 'blue' else toRemove).add_edge(u, v)
+        nodes = list(resume.remaining.nodes)
+    remainingEdges = toAdd.number_of_edges() + toRemove.number_of_edges()
+    budget = SearchBudget(cancel, timeBudget, maxIterations)
+    while nodes:
+        start = nodes.pop()
         cycle :list[NodeType] = [ start ]
         colour :Graph = True
         curGraph = toAdd
         while candidates := [
             n for n in curGraph.neighbors(cycle[-1])
         ]:
+            if budget.exhausted():
+                # Put back the edges of the unfinished cycle
+                for i, (u,v) in enumerate(pairwise(cycle)):
+                    (toAdd if i % 2 == 0 else toRemove).add_edge(u, v)
+                remaining :Graph = Graph()
+                remaining.add_edges_from(toRemove.edges, color='red')
+                remaining.add_edges_from(toAdd.edges, color='blue')
+                return CycleProgress(cycles, remaining)
             curGraph.remove_edge(cycle[-1], candidates[0])
             cycle.append(candidates[0])
             if candidates[0] in nodes: nodes.remove(candidates[0])
             curGraph = toRemove if colour else toAdd
             colour = not colour
+            remainingEdges -= 1
+            if progress is not None: progress(remainingEdges, len(cycles))
         if len(cycle) > 1: cycles.append(cycle[:-1])
-    return cycles
+    return CycleProgress(cycles, Graph())
+
+def find_alternating_cycles (G1:Graph, G2:Graph) -> list[list[NodeType]]:
+    "Returns a list of alternating cycles, always starting from an edge *to be added*"
+    return search_alternating_cycles(G1, G2).cycles
 
 def swap_edges (G:Graph, edge1:EdgeType, edge2:EdgeType):
     G.remove_edge(edge1[0], edge1[1])
@@ -103,9 +380,93 @@ def swap_edges (G:Graph, edge1:EdgeType, edge2:EdgeType):
     G.add_edge(edge1[0], edge2[0])
     G.add_edge(edge1[1], edge2[1])
 
-def find_edge_swaps (G1:Graph, G2:Graph) -> list[tuple[EdgeType,EdgeType]]:
-    Gi = G1.copy()
-    DG = get_difference_graph(Gi, G2)
+def get_difference_edges (G1:Graph, G2:Graph) -> Graph:
+    """Returns a graph of only the edges from `get_difference_graph`, coloured the same way and in the same order,
+    but without the nodes that have no difference edges.
+    Neither graph is copied, so this only uses memory for the difference itself."""
+    toRemove :Graph = Graph(e for e in G1.edges if not G2.has_edge(*e))
+    toInsert :Graph = Graph(e for e in G2.edges if not G1.has_edge(*e))
+    DG :Graph = Graph()
+    # get_difference_graph keeps G1's node order, then adds red edges in G1's edge order and blue edges in G2's
+    DG.add_nodes_from(n for n in G1 if n in toRemove or n in toInsert)
+    for part, colour, G in ((toRemove, 'red', G1), (toInsert, 'blue', G2)):
+        seen :set[NodeType] = set()
+        for u in G:
+            if u in part:
+                for v in part.neighbors(u):
+                    if v not in seen: DG.add_edge(u, v, color=colour)
+            seen.add(u)
+    return DG
+
+def _neighbour_position (G:Graph, u:NodeType, v:NodeType) -> int:
+    return next(i for i,n in enumerate(G._adj[u]) if n == v)
+
+def _insert_neighbour (neighbours:dict, position:int, v:NodeType, data:dict):
+    "Puts `v` back into a neighbour dict at `position`, moving only the neighbours after it"
+    after = [(n, neighbours.pop(n)) for n in list(islice(neighbours, position, None))]
+    neighbours[v] = data
+    neighbours.update(after)
+
+class SwapProgress (NamedTuple):
+    """The result of `search_edge_swaps`, which may be partial.
+    - swaps : The swaps applied so far, in order, starting from `G1`
+    - deferred : The swaps that can only be applied after all others, in the order they were found
+    - remaining : The difference edges still to be resolved, coloured like `get_difference_graph`"""
+    swaps :list[tuple[EdgeType,EdgeType]]
+    deferred :list[tuple[EdgeType,EdgeType]]
+    remaining :Graph
+
+    @property
+    def complete (self) -> bool: return self.remaining.number_of_edges() == 0
+
+    def plan (self) -> list[tuple[EdgeType,EdgeType]]:
+        "Returns the full list of swaps, only valid once the search is `complete`"
+        return self.swaps + self.deferred[::-1]
+
+def search_edge_swaps (G1:Graph, G2:Graph, *, inPlace:bool=False, resume:SwapProgress|None=None,
+    cancel:Callable[[],bool]|None=None, timeBudget:float|None=None, maxIterations:int|None=None,
+    progress:Callable[[int,int],None]|None=None,
+    checkpoint:Callable[[SwapProgress],None]|None=None, checkpointInterval:float=60.0
+) -> SwapProgress:
+    """Anytime version of `find_edge_swaps`, which stops early once its `SearchBudget` runs out,
+    and can continue from an earlier partial result with `resume`, on this or any other worker.
+    `progress` is called after each step with the number of remaining difference edges and swaps emitted.
+    `checkpoint` is called with the current state about every `checkpointInterval` seconds, and must save it before returning,
+    see `GraphIO.save_checkpoint`. Slow checkpoints are spaced out further, so they take at most a few percent of the runtime.
+
+    By default the search runs on a copy of `G1`. With `inPlace`, it runs on `G1` itself and
+    only the difference edges are copied, while every edge a swap adds or removes is kept in an undo log,
+    along with where each removed edge sat among its nodes' neighbours and its edge data, so the log grows with the swaps.
+    `G1` is then restored exactly, including edge data and neighbour order, by undoing the log in reverse before returning or raising.
+    Both modes return the same swaps."""
+    Gi = G1 if inPlace else G1.copy()
+    if resume is not None:
+        # A deep copy keeps the neighbour order, so resuming makes the same choices an uninterrupted run would
+        DG = deepcopy(resume.remaining)
+    elif inPlace:
+        DG = get_difference_edges(G1, G2)
+    else:
+        DG = get_difference_graph(Gi, G2)
+    budget = SearchBudget(cancel, timeBudget, maxIterations)
+    nextCheckpoint = perf_counter() + checkpointInterval
+    # Each edge change, in order, as (u, v, data, position in u's neighbours, position in v's neighbours)
+    # for a removed edge, or (u, v, None, 0, 0) for an added one
+    undoLog :list[tuple[NodeType, NodeType, dict|None, int, int]] = []
+
+    def apply_swap (edgeSwap:tuple[EdgeType,EdgeType]):
+        if not inPlace:
+            swap_edges(Gi, *edgeSwap)
+            return
+        (a, b), (c, d) = edgeSwap
+        for u, v in ((a, b), (c, d)):
+            if not Gi.has_edge(u, v): Gi.remove_edge(u, v) # Raises the same error swap_edges would
+            data = Gi._adj[u][v]
+            undoLog.append((u, v, data, _neighbour_position(Gi, u, v), _neighbour_position(Gi, v, u)))
+            Gi.remove_edge(u, v)
+        for u, v in ((a, c), (b, d)):
+            if Gi.has_edge(u, v): continue
+            Gi.add_edge(u, v)
+            undoLog.append((u, v, None, 0, 0))
 
     def find_valid_nodes(edges:list[NodeType,NodeType,str]) -> tuple[EdgeType, EdgeType, str, str]:
         for e2, e3, c23 in edges:
@@ -123,31 +484,468 @@ def find_edge_swaps (G1:Graph, G2:Graph) -> list[tuple[EdgeType,EdgeType]]:
             DG.add_edge(e2, e3, color=c23)
         raise RuntimeError("Unable to find a valid swap, even though one should always exist")
 
-    def find_valid_swap ():
-        edges = list(DG.edges.data('color'))
-        if len(edges) == 0: return []
-        E1, E2, E3, E4, C23 = find_valid_nodes(edges)
-        DG.remove_edge(E1, E2)
-        DG.remove_edge(E3, E4)
-        if DG.has_edge(E1, E4):
-            DG.remove_edge(E1, E4)
-            edgeSwap = ((E1,E2), (E4,E3)) if C23 == 'blue' else ((E2,E3), (E1,E4))
-            swap_edges(Gi, *edgeSwap)
-            return [edgeSwap] + find_valid_swap()
-        else:
-            if C23 == 'blue':
+    # Swaps that can be applied right away go in order, the rest are deferred until every
+    # other swap is done, and are applied in the reverse order they were found
+    ordered :list[tuple[EdgeType,EdgeType]] = []
+    deferred :list[tuple[EdgeType,EdgeType]] = []
+    try:
+        if resume is not None:
+            for edgeSwap in resume.swaps:
+                apply_swap(edgeSwap)
+                ordered.append(edgeSwap)
+            deferred.extend(resume.deferred)
+        while edges := list(DG.edges.data('color')):
+            if budget.exhausted(): break
+            E1, E2, E3, E4, C23 = find_valid_nodes(edges)
+            DG.remove_edge(E1, E2)
+            DG.remove_edge(E3, E4)
+            resolved = 2
+            if DG.has_edge(E1, E4):
+                DG.remove_edge(E1, E4)
+                resolved = 4
+                edgeSwap = ((E1,E2), (E4,E3)) if C23 == 'blue' else ((E2,E3), (E1,E4))
+                apply_swap(edgeSwap)
+                ordered.append(edgeSwap)
+            elif C23 == 'blue':
                 DG.add_edge(E1, E4, color='red')
                 edgeSwap = ((E1,E2), (E4,E3))
                 if not Gi.has_edge(E1, E4):
-                    swap_edges(Gi, *edgeSwap)
-                    return [edgeSwap] + find_valid_swap()
-                return find_valid_swap() + [edgeSwap]
+                    apply_swap(edgeSwap)
+                    ordered.append(edgeSwap)
+                else: deferred.append(edgeSwap)
             else: # red
                 DG.add_edge(E1, E4, color='blue')
                 edgeSwap = ((E2,E3), (E1,E4))
                 if Gi.has_edge(E1, E4):
-                    swap_edges(Gi, *edgeSwap)
-                    return [edgeSwap] + find_valid_swap()
-                return find_valid_swap() + [edgeSwap]
+                    apply_swap(edgeSwap)
+                    ordered.append(edgeSwap)
+                else: deferred.append(edgeSwap)
+            if progress is not None: progress(len(edges) - resolved, len(ordered) + len(deferred))
+            if checkpoint is not None and (now := perf_counter()) >= nextCheckpoint:
+                checkpoint(SwapProgress(ordered, deferred, DG))
+                nextCheckpoint = perf_counter() + max(checkpointInterval, (perf_counter() - now) * 50)
+    finally:
+        # Undoing in reverse means every removed edge goes back among the same neighbours it was removed from
+        for u, v, data, uPosition, vPosition in reversed(undoLog):
+            if data is None:
+                Gi.remove_edge(u, v)
+            else:
+                _insert_neighbour(Gi._adj[u], uPosition, v, data)
+                _insert_neighbour(Gi._adj[v], vPosition, u, data)
+        if undoLog: getattr(Gi, '__networkx_cache__', {}).clear()
+    return SwapProgress(ordered, deferred, DG)
+
+def find_edge_swaps (G1:Graph, G2:Graph, *, inPlace:bool=False) -> list[tuple[EdgeType,EdgeType]]:
+    """Returns a list of edge swaps, see `swap_edges`, that turns `G1` into `G2`.
+    With `inPlace`, `G1` itself is used while searching and restored afterwards, see `search_edge_swaps`."""
+    return search_edge_swaps(G1, G2, inPlace=inPlace).plan()
+
+class IncrementalSwaps:
+    """Keeps the difference graph and swap plan from `G1` to `G2`, so that small edits to `G2`
+    only recompute the swaps of the difference graph components they touch.
+
+    Components of the difference graph share no nodes, so the swaps of one component never
+    affect another, and the plan is just the component plans one after the other."""
+
+    def __init__ (self, G1:Graph, G2:Graph):
+        self.G1 :Graph = G1
+        self.G2 :Graph = G2.copy()
+        self.DG :Graph = get_difference_graph(G1, self.G2)
+        self.components :dict[int, list[NodeType]] = {}
+        self.plans :dict[int, list[tuple[EdgeType,EdgeType]]] = {}
+        self.componentOf :dict[NodeType, int] = {}
+        self._nextId :int = 0
+        for component in get_components(self.DG):
+            if len(component) > 1: self._plan_component(component)
+
+    @property
+    def swaps (self) -> list[tuple[EdgeType,EdgeType]]:
+        "The current list of edge swaps that turns `G1` into `G2`"
+        return [swap for plan in self.plans.values() for swap in plan]
+
+    def _plan_component (self, component:list[NodeType]):
+        i = self._nextId
+        self._nextId += 1
+        self.components[i] = component
+        self.plans[i] = find_edge_swaps(self.G1.subgraph(component), self.G2.subgraph(component))
+        for n in component: self.componentOf[n] = i
+
+    def _toggle (self, u:NodeType, v:NodeType, colour:str):
+        if self.DG.has_edge(u, v): self.DG.remove_edge(u, v)
+        else: self.DG.add_edge(u, v, color=colour)
+
+    def update (self, edits:Iterable[tuple[EdgeType,EdgeType]]) -> list[tuple[EdgeType,EdgeType]]:
+        """Applies each edit to `G2` as an edge swap, in the same form as `swap_edges`, then
+        recomputes only the affected part of the plan. Returns the new list of swaps.
+        Edits may depend on earlier edits in the same batch. If any edit is invalid, a ValueError is raised
+        before anything is changed."""
+        edits = list(edits)
+        # Check the whole batch first, against the edges it would add and remove
+        added :set[frozenset] = set()
+        removed :set[frozenset] = set()
+        def has_edge (u:NodeType, v:NodeType) -> bool:
+            e = frozenset((u, v))
+            return e in added or (e not in removed and self.G2.has_edge(u, v))
+        for e1, e2 in edits:
+            if len({*e1, *e2}) != 4 \
+            or not has_edge(*e1) or not has_edge(*e2) \
+            or has_edge(e1[0], e2[0]) or has_edge(e1[1], e2[1]):
+                raise ValueError(f"Invalid edit for G2: {e1}, {e2}")
+            for e in (frozenset(e1), frozenset(e2)):
+                if e in added: added.remove(e)
+                else: removed.add(e)
+            for e in (frozenset((e1[0], e2[0])), frozenset((e1[1], e2[1]))):
+                if e in removed: removed.remove(e)
+                else: added.add(e)
+        touched :set[NodeType] = set()
+        for e1, e2 in edits:
+            swap_edges(self.G2, e1, e2)
+            self._toggle(*e1, 'red')
+            self._toggle(*e2, 'red')
+            self._toggle(e1[0], e2[0], 'blue')
+            self._toggle(e1[1], e2[1], 'blue')
+            touched.update((*e1, *e2))
+        # Every node of a touched component may now belong to a different component
+        stale :set[int] = {self.componentOf[n] for n in touched if n in self.componentOf}
+        for i in stale:
+            component = self.components.pop(i)
+            for n in component: del self.componentOf[n]
+            del self.plans[i]
+            touched.update(component)
+        for n in touched:
+            if n in self.componentOf or self.DG.degree(n) == 0: continue
+            component :list[NodeType] = [ n ]
+            seen :set[NodeType] = { n }
+            for n1 in component:
+                for n2 in self.DG.neighbors(n1):
+                    if n2 not in seen:
+                        seen.add(n2)
+                        component.append(n2)
+            self._plan_component(component)
+        return self.swaps
+
+class CompleteDifferenceView:
+    """An implicit version of `Deprecated.get_complete_difference_graph`, which answers the same questions about any pair of nodes
+    without building the complete graph. Only the solid edges are stored, as `solid`, from `get_difference_edges`,
+    everything else is looked up in `G1` and `G2` when asked for, and neighbours are iterated lazily.
+    - red & solid = In `G1` but not `G2`, this edge must be removed
+    - blue & solid = In `G2` but not `G1`, this edge must be added
+    - red & dashed = In both, the edge can be removed, but we dont want to
+    - blue & dashed = In neither, the edge can be added, but we dont want to"""
+
+    def __init__ (self, G1:Graph, G2:Graph):
+        self.G1 :Graph = G1
+        self.G2 :Graph = G2
+        self.solid :Graph = get_difference_edges(G1, G2)
+
+    def __len__ (self) -> int: return len(self.G1)
+
+    def __iter__ (self) -> Iterator[NodeType]: return iter(self.G1)
+
+    def is_solid (self, u:NodeType, v:NodeType) -> bool: return self.solid.has_edge(u, v)
+
+    def color (self, u:NodeType, v:NodeType) -> str: return 'red' if self.G1.has_edge(u, v) else 'blue'
+
+    def weight (self, u:NodeType, v:NodeType) -> int: return -1 if self.solid.has_edge(u, v) else +1
+
+    def edge (self, u:NodeType, v:NodeType) -> dict:
+        "Returns the same attributes as `get_complete_difference_graph(G1, G2).edges[u, v]`"
+        solid = self.solid.has_edge(u, v)
+        return {
+            'color': self.color(u, v),
+            'style': 'solid' if solid else 'dashed',
+            'weight': -1 if solid else +1
+        }
+
+    def neighbors (self, u:NodeType) -> Iterator[NodeType]:
+        "Every other node, since the graph is complete"
+        return (v for v in self.G1 if v != u)
+
+    def edge_node_successors (self, edge:EdgeType) -> Iterator[EdgeType]:
+        """For a node (u,v) of `Deprecated.get_edge_node_graph`, yields the nodes it has edges to,
+        being every (v,w) where w isn't u and the colour changes"""
+        u, v = edge
+        colour = self.color(u, v)
+        return ((v, w) for w in self.neighbors(v) if w != u and self.color(v, w) != colour)
+
+def get_swap_lower_bound (G1:Graph, G2:Graph) -> int:
+    """Returns a lower bound on the number of swaps needed to turn `G1` into `G2`.
+    Every red edge of the alternating cycles from `find_alternating_cycles` must be removed,
+    and each swap removes at most two of them."""
+    redEdges = sum(len(cycle)//2 for cycle in find_alternating_cycles(G1, G2))
+    return (redEdges + 1) // 2
+
+def _swap_edge_keys (swap:tuple[EdgeType,EdgeType]) -> tuple[frozenset, frozenset, frozenset, frozenset]:
+    "Returns the two edges the swap removes, followed by the two edges it adds"
+    (a, b), (c, d) = swap
+    return frozenset((a,b)), frozenset((c,d)), frozenset((a,c)), frozenset((b,d))
+
+def _merge_swaps (first:tuple[EdgeType,EdgeType], second:tuple[EdgeType,EdgeType]) -> tuple|None:
+    """Returns the single swap that has the same effect as applying `first` then `second`,
+    an empty tuple if they cancel out, or None if they can't be merged"""
+    net :dict[frozenset, int] = {}
+    for swap in (first, second):
+        for k, key in enumerate(_swap_edge_keys(swap)):
+            net[key] = net.get(key, 0) + (-1 if k < 2 else +1)
+    removed = [tuple(key) for key,change in net.items() if change == -1]
+    added = {key for key,change in net.items() if change == +1}
+    if not removed and not added:
+        return ()
+    if len(removed) != 2 or len(added) != 2 or len({*removed[0], *removed[1]}) != 4:
+        return None
+    (p, q), (x, y) = removed
+    for r, s in ((x, y), (y, x)):
+        if frozenset((p,r)) in added and frozenset((q,s)) in added:
+            return ((p,q), (r,s))
+    return None
+
+def _shortest_alternating_cycle (DG:Graph, u:NodeType, v:NodeType, maxLength:int) -> list[NodeType]|None:
+    """Returns the nodes of a shortest closed alternating walk of `DG` with at most `maxLength` edges, that starts with the red edge (`u`,`v`)
+    and uses no edge twice, or None if there isn't one. The walk may pass through a node more than once.
+    The search runs from both ends at once, so it only looks about half of `maxLength` edges away from either."""
+    other = {'red': 'blue', 'blue': 'red'}
+    # States are (node, colour of the next edge). Forward walks start at v with a blue edge,
+    # backward walks start at u, reached by a blue edge, so they need a red edge next
+    forward :dict[tuple[NodeType,str], tuple[NodeType,str]|None] = {(v, 'blue'): None}
+    backward :dict[tuple[NodeType,str], tuple[NodeType,str]|None] = {(u, 'red'): None}
+    forwardFrontier :list[tuple[NodeType,str]] = [(v, 'blue')]
+    backwardFrontier :list[tuple[NodeType,str]] = [(u, 'red')]
+    def path (parents:dict, state:tuple[NodeType,str]|None) -> list[NodeType]:
+        nodes :list[NodeType] = []
+        while state is not None:
+            nodes.append(state[0])
+            state = parents[state]
+        return nodes
+    for _ in range(maxLength - 1):
+        if not forwardFrontier or not backwardFrontier: return None
+        growForward = len(forwardFrontier) <= len(backwardFrontier)
+        seen, meeting = (forward, backward) if growForward else (backward, forward)
+        frontier :list[tuple[NodeType,str]] = []
+        for state in (forwardFrontier if growForward else backwardFrontier):
+            x, c = state
+            # Forward walks leave x by an edge of colour c, backward walks came into x by the other colour
+            edgeColour = c if growForward else other[c]
+            for y, data in DG._adj[x].items():
+                if data['color'] != edgeColour: continue
+                nextState = (y, other[edgeColour]) if growForward else (y, edgeColour)
+                if nextState in seen: continue
+                seen[nextState] = state
+                frontier.append(nextState)
+        if growForward: forwardFrontier = frontier
+        else: backwardFrontier = frontier
+        for state in frontier:
+            if state not in meeting: continue
+            walk = path(forward, state)[::-1] + path(backward, state)[1:]
+            cycle = [u] + walk[:-1]
+            if len({frozenset(e) for e in pairwise(cycle + cycle[:1])}) == len(cycle): return cycle
+    return None
+
+def _resolve_cycle (cycle:list[NodeType], is_present:Callable[[NodeType,NodeType],bool|None]) -> list[tuple[EdgeType,EdgeType]]|None:
+    """Returns one swap per red edge of a closed alternating walk but one, which together remove its red edges and add its blue ones,
+    where `cycle[0]`-`cycle[1]` is red. Each swap takes a path a-b-c-d of the walk, removes its red edges and adds b-c and the chord a-d,
+    which leaves a walk two edges shorter, until the last swap adds the final two blue edges.
+    Returns None if the walk gets stuck where no chord is known to be absent, see `is_present`."""
+    # Kept reversed, so that the usual step from a = `walk[-1]` only deletes from the end
+    walk = cycle[::-1]
+    # Edges of the walk still to be resolved, which chords must stay clear of, and every edge whose presence has changed
+    pending :set[frozenset] = {frozenset(e) for e in pairwise(cycle + cycle[:1])}
+    changed :dict[frozenset, bool] = {}
+    def chord_allowed (a:NodeType, d:NodeType) -> bool:
+        key = frozenset((a, d))
+        return a != d and key not in pending and (changed[key] if key in changed else is_present(a, d)) is False
+    swaps :list[tuple[EdgeType,EdgeType]] = []
+    while (k := len(walk)) > 4:
+        if not chord_allowed(walk[-1], walk[-4]):
+            # Start from somewhere else along the walk, keeping its first edge red
+            s = next((s for s in range(2, k, 2) if chord_allowed(walk[k-1-s], walk[(k-4-s) % k])), None)
+            if s is None: return None
+            walk = walk[k-s:] + walk[:k-s]
+        a, b, c, d = walk[-1], walk[-2], walk[-3], walk[-4]
+        swaps.append(((b, a), (c, d)))
+        for e, present in (((a, b), False), ((c, d), False), ((b, c), True), ((a, d), True)):
+            pending.discard(frozenset(e))
+            changed[frozenset(e)] = present
+        del walk[-3:-1]
+    a, b, c, d = walk[::-1]
+    swaps.append(((b, a), (c, d)))
+    return swaps
+
+def _replan_swaps (DG:Graph, is_present:Callable[[NodeType,NodeType],bool|None]) -> list[tuple[EdgeType,EdgeType]]|None:
+    """Returns swaps that remove the red edges of the coloured difference graph `DG` and add its blue edges,
+    or None if some part can't be resolved with `_resolve_cycle`. `DG` is used up in the process.
+    Alternating cycles of up to 10 edges are resolved first, shortest first, then the rest is split into closed alternating walks."""
+    # Edges whose presence has changed since the start, which are exactly the edges resolved so far
+    changed :dict[frozenset, bool] = {}
+    def is_present_now (u:NodeType, v:NodeType) -> bool|None:
+        key = frozenset((u, v))
+        return changed[key] if key in changed else is_present(u, v)
+    swaps :list[tuple[EdgeType,EdgeType]] = []
+    def resolve (cycle:list[NodeType]) -> bool:
+        cycleSwaps = _resolve_cycle(cycle, is_present_now)
+        if cycleSwaps is None: return False
+        swaps.extend(cycleSwaps)
+        for i, (x, y) in enumerate(pairwise(cycle + cycle[:1])):
+            changed[frozenset((x, y))] = i % 2 == 1
+        return True
+    for maxLength in range(4, 12, 2):
+        for u, v, c in list(DG.edges.data('color')):
+            if c != 'red' or not DG.has_edge(u, v): continue
+            cycle = _shortest_alternating_cycle(DG, u, v, maxLength)
+            if cycle is not None and resolve(cycle):
+                DG.remove_edges_from(pairwise(cycle + cycle[:1]))
+    # Every node has as many red as blue edges left, so a walk of alternating colours can only end back where it started
+    other = {'red': 'blue', 'blue': 'red'}
+    for u in list(DG):
+        while any(data['color'] == 'red' for data in DG.adj[u].values()):
+            cycle :list[NodeType] = [ u ]
+            c = 'red'
+            while (y := next((y for y, data in DG.adj[cycle[-1]].items() if data['color'] == c), None)) is not None:
+                DG.remove_edge(cycle[-1], y)
+                cycle.append(y)
+                c = other[c]
+            if not resolve(cycle[:-1]): return None
+    return swaps
+
+def optimize_swaps (swaps:list[tuple[EdgeType,EdgeType]], G1:Graph|None=None) -> tuple[list[tuple[EdgeType,EdgeType]], int]:
+    """Shortens a valid list of edge swaps from `G1`, returning (`optimizedSwaps`, `reduction`).
+
+    Edges the plan adds then removes again, or removes then adds back, are the intermediate edges it walks through.
+    Only the net change matters, so the plan is first replanned from scratch: every alternating cycle of the net change is resolved with one swap
+    per red edge but one, shortest cycles first, so as many cycles as possible are closed. Every edge a replanned swap adds or removes must be known to be
+    absent or present at that point.
+    Without `G1` only the edges the plan touches are known, so passing it usually shortens the plan much further.
+
+    If that fails or isn't shorter, swaps are instead combined with an earlier swap they share an edge with, as long as no swap in between touches
+    the earlier swap's edges. The pair is dropped if they cancel out, or replaced by one swap if their combined effect is a single swap,
+    and the result may be combined again with an even earlier swap.
+    Both steps take about linear time on sparse graphs. The result can't be shorter than `get_swap_lower_bound`, but may not reach it."""
+    result :list[tuple[EdgeType,EdgeType]|None] = []
+    # For each edge, the indices of the swaps in `result` touching it, most recent last
+    touching :dict[frozenset, list[int]] = {}
+    for swap in swaps:
+        while swap is not None:
+            merged = None
+            for i in sorted({touching[key][-1] for key in _swap_edge_keys(swap) if touching.get(key)}, reverse=True):
+                previous = result[i]
+                # The combined swap takes the later swap's place, so nothing in between may rely on what the earlier one changed
+                if any(touching[key][-1] != i for key in _swap_edge_keys(previous)): continue
+                merged = _merge_swaps(previous, swap)
+                if merged is not None: break
+            if merged is None: break
+            result[i] = None
+            for key in _swap_edge_keys(previous): touching[key].pop()
+            swap = merged if merged else None
+        if swap is not None:
+            for key in _swap_edge_keys(swap): touching.setdefault(key, []).append(len(result))
+            result.append(swap)
+    optimized = [swap for swap in result if swap is not None]
+
+    # Whether each edge the plan touches is there before it, and after it
+    before :dict[frozenset, bool] = {}
+    after :dict[frozenset, bool] = {}
+    for swap in swaps:
+        for k, key in enumerate(_swap_edge_keys(swap)):
+            before.setdefault(key, k < 2)
+            after[key] = k >= 2
+    DG :Graph = Graph()
+    for key, present in before.items():
+        if present != after[key]: DG.add_edge(*key, color='red' if present else 'blue')
+    def is_present (u:NodeType, v:NodeType) -> bool|None:
+        key = frozenset((u, v))
+        if key in before: return before[key]
+        return G1.has_edge(u, v) if G1 is not None else None
+    replanned = _replan_swaps(DG, is_present)
+    if replanned is not None and len(replanned) < len(optimized):
+        optimized = replanned
+    return optimized, len(swaps) - len(optimized)
+
+def splice_cycles (DG:Graph, cycles:list[list[NodeType]]) -> list[list[NodeType]]:
+    """Joins alternating cycles of the coloured graph `DG` that share a node into one alternating cycle,
+    returning one cycle per group of touching cycles"""
+    def colour (u, v): return DG[u][v]['color']
+    remaining = [c for c in cycles if c]
+    joined :list[list[NodeType]] = []
+    while remaining:
+        parent = remaining.pop()
+        parentNodes = set(parent)
+        while (i := next((i for i,c in enumerate(remaining) if not parentNodes.isdisjoint(c)), None)) is not None:
+            child = remaining.pop(i)
+            centre = next(n for n in child if n in parentNodes)
+            k = parent.index(centre)
+            j = child.index(centre)
+            child = child[j:] + child[:j]
+            if colour(parent[k-1], centre) != colour(centre, child[1%len(child)]):
+                parent = parent[:k] + child + parent[k:]
+            else:
+                parent = parent[:k] + [centre] + child[:0:-1] + parent[k:]
+            parentNodes.update(child)
+        joined.append(parent)
+    return joined
+
+def find_best_cycle (G1:Graph, G2:Graph, *, timeBudget:float|None=None) -> tuple[int, list[NodeType]]:
+    """Finds a minimum cost alternating cycle of the complete difference graph, see `CompleteDifferenceView`,
+    where solid edges cost -1 and dashed edges cost +1. Returns (`cost`, `cycle`), or (0, []) if `G1` and `G2` are the same.
 
-    return find_valid_swap()
+    The search starts from the best cycle that covers a whole component of the difference graph,
+    then runs a branch and bound search for cheaper cycles, which must join components with dashed edges.
+    A path is pruned once its cost minus the solid edges still unused can't beat the best cycle so far.
+    If `timeBudget` seconds pass, the best cycle found so far is returned."""
+    deadline = None if timeBudget is None else perf_counter() + timeBudget
+    view = CompleteDifferenceView(G1, G2)
+    DG = view.solid
+    solidCount = DG.number_of_edges()
+    if solidCount == 0: return (0, [])
+    # Start from the largest cycle that stays within a component, found in linear time
+    bestCycle = max(splice_cycles(DG, find_alternating_cycles(G1, G2)), key=len)
+    best = -len(bestCycle)
+    other = {'red': 'blue', 'blue': 'red'}
+    forbidden :set[NodeType] = set()
+    used :set[frozenset] = set()
+    unused = solidCount
+    def moves (x:NodeType, c:str) -> Iterable[tuple[NodeType, int]]:
+        # Dashed moves can reach nodes with no solid edges, which `DG` leaves out
+        for y in (DG.neighbors(x) if x in DG else ()):
+            if y not in forbidden and DG[x][y]['color'] == c and frozenset((x,y)) not in used:
+                yield y, -1
+        for y in view.neighbors(x):
+            if y not in forbidden and not DG.has_edge(x, y) \
+            and view.color(x, y) == c and frozenset((x,y)) not in used:
+                yield y, +1
+    iterations = 0
+    # Every cycle with solid edges passes through a node with solid edges, so try each as the root,
+    # and once a root is exhausted no later cycle needs to pass through it
+    for root in [n for n in DG.nodes if DG.degree(n) > 0]:
+        if best == -solidCount: break
+        path :list[NodeType] = [ root ]
+        weights :list[int] = []
+        cost = 0
+        # Cycles can always be traversed so their first edge from the root is blue
+        stack = [ (moves(root, 'blue'), 'blue') ]
+        while stack:
+            iterations += 1
+            if deadline is not None and iterations % 1024 == 0 and perf_counter() > deadline:
+                return (best, bestCycle)
+            frame, c = stack[-1]
+            move = next(frame, None)
+            if move is None:
+                stack.pop()
+                if weights:
+                    y = path.pop()
+                    used.remove(frozenset((path[-1], y)))
+                    cost -= (w := weights.pop())
+                    unused += (w < 0)
+                continue
+            y, w = move
+            if cost + w - (unused - (w < 0)) >= best: continue
+            used.add(frozenset((path[-1], y)))
+            path.append(y)
+            weights.append(w)
+            cost += w
+            unused -= (w < 0)
+            if y == root and c == 'red' and cost < best:
+                best, bestCycle = cost, path[:-1]
+                if best == -solidCount: break
+            stack.append((moves(y, other[c]), other[c]))
+        unused -= sum(1 for y in DG.neighbors(root) if y not in forbidden)
+        forbidden.add(root)
+    return (best, bestCycle)
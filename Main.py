@@ -1,5 +1,5 @@
 
-from Graphing import construct_graph, get_difference_graph, find_alternating_cycles, create_cycle_graph, find_edge_swaps, swap_edges
+from Graphing import generate_realizations, realization_to_graph, get_difference_graph, find_alternating_cycles, create_cycle_graph, find_edge_swaps, swap_edges
 from GraphIO import display_graphs, load_graphs, save_graph
 from typing import Callable, TypeVar, Iterable
 from itertools import combinations
@@ -12,10 +12,8 @@ def generate_graphs (degrees):
     labels = "abcdefghijklmnopqrstuvwxyz"
     # labels = None
 
-    G1 = construct_graph(degrees, nodeLabels=labels)
+    G1, G2 = (realization_to_graph(edges, len(degrees), nodeLabels=labels) for edges in generate_realizations(degrees, 2))
     G1.graph['name'] = "G1"
-
-    G2 = construct_graph(degrees, nodeLabels=labels)
     G2.graph['name'] = "G2"
 
     DG = get_difference_graph(G1, G2)
@@ -93,8 +91,10 @@ def main ():
                 "Please supply a degree sequence seperated by whitespace...\n> ", parse_deg_seq
             )
             nodeLabels = "abcdefghijklmnopqrstuvwxyz" if len(degreeSequence) <= 26 else None
-            G1 = construct_graph(degreeSequence, nodeLabels=nodeLabels)
-            G2 = construct_graph(degreeSequence, nodeLabels=nodeLabels)
+            G1, G2 = (
+                realization_to_graph(edges, len(degreeSequence), nodeLabels=nodeLabels)
+                for edges in generate_realizations(degreeSequence, 2)
+            )
         elif ans == 2:
             length = gather_input(
                 "Please input length of degree sequence: ",
@@ -110,8 +110,10 @@ def main ():
             )
             degreeSequence = create_degree_sequence(length, edgeChance, heavyTailBias)
             nodeLabels = "abcdefghijklmnopqrstuvwxyz" if len(degreeSequence) <= 26 else None
-            G1 = construct_graph(degreeSequence, nodeLabels=nodeLabels)
-            G2 = construct_graph(degreeSequence, nodeLabels=nodeLabels)
+            G1, G2 = (
+                realization_to_graph(edges, len(degreeSequence), nodeLabels=nodeLabels)
+                for edges in generate_realizations(degreeSequence, 2)
+            )
         elif ans == 3:
             G1, G2 = gather_input(
                 "Please input the name of the graph pair: ",
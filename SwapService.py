@@ -0,0 +1,200 @@
+import os
+import asyncio
+import json
+import socket
+import multiprocessing
+from collections import OrderedDict
+from concurrent.futures import Executor, ProcessPoolExecutor
+from functools import lru_cache
+from math import ceil
+from typing import Any
+from networkx import Graph
+from Graphing import get_difference_graph, find_alternating_cycles, find_edge_swaps
+from GraphIO import load_graphs
+
+METHODS = ("get_difference_graph", "find_alternating_cycles", "find_edge_swaps")
+
+def _create_worker_pool (workers:int|None=None) -> ProcessPoolExecutor:
+    """Returns a process pool whose workers aren't forked from the service, since forked workers would inherit
+    open client sockets and keep those connections from ever closing"""
+    method = "forkserver" if "forkserver" in multiprocessing.get_all_start_methods() else "spawn"
+    return ProcessPoolExecutor(workers, mp_context=multiprocessing.get_context(method))
+
+@lru_cache(maxsize=64)
+def _load_pair (name:str) -> tuple[Graph, Graph]:
+    "Loads a premade graph pair once per worker, later requests for the same pair reuse it"
+    return load_graphs(name)
+
+def _graph_from_payload (payload:dict) -> Graph:
+    G = Graph()
+    G.add_nodes_from(payload.get('nodes', []))
+    G.add_edges_from((u, v) for u,v in payload['edges'])
+    return G
+
+def _run_request (method:str, pair:Any) -> Any:
+    "Runs a single request inside a worker, returning a json friendly result"
+    if isinstance(pair, str):
+        G1, G2 = _load_pair(pair)
+    else:
+        G1, G2 = _graph_from_payload(pair[0]), _graph_from_payload(pair[1])
+    if method == "get_difference_graph":
+        DG = get_difference_graph(G1, G2)
+        return {
+            'nodes': list(DG.nodes),
+            'edges': [[u, v, c] for u,v,c in DG.edges.data('color')]
+        }
+    if method == "find_alternating_cycles":
+        return find_alternating_cycles(G1, G2)
+    if method == "find_edge_swaps":
+        return find_edge_swaps(G1, G2)
+    raise ValueError("Unknown method: "+str(method))
+
+def _run_batch (batch:list[tuple[str, Any]]) -> list[tuple[bool, Any]]:
+    """Runs a batch of requests in one go, so a worker round trip is paid once per batch.
+    Returns a list of (`ok`, `resultOrError`), one per request"""
+    results :list[tuple[bool, Any]] = []
+    for method, pair in batch:
+        try:
+            results.append((True, _run_request(method, pair)))
+        except Exception as err:
+            results.append((False, f"{type(err).__name__}: {err}"))
+    return results
+
+class SwapService:
+    """A long running service that keeps the graphing modules loaded and answers requests for
+    `get_difference_graph`, `find_alternating_cycles` and `find_edge_swaps`.
+
+    Requests and responses are single lines of json. A request looks like:
+    `{"id": 1, "method": "find_edge_swaps", "pair": "Square"}`, where `pair` is either the name of a premade graph pair,
+    or two graphs given as `[{"nodes": [...], "edges": [[u,v], ...]}, {...}]`.
+    Each response is `{"id": 1, "result": ...}` or `{"id": 1, "error": "..."}`,
+    and is written back as soon as it is ready, so responses on one connection may come out of order.
+
+    A request that arrives while no others are waiting is run right away. Otherwise concurrent requests are gathered into
+    micro batches of up to `batchSize` requests, waiting at most `batchWindow` seconds, and each batch is split evenly
+    across the `executor`'s `workers`. Results of recent requests are cached, up to `cacheSize` of them."""
+
+    def __init__ (self, *, executor:Executor|None=None, workers:int|None=None,
+        batchWindow:float=0.002, batchSize:int=32, cacheSize:int=256
+    ):
+        self.executor :Executor = executor if executor is not None else _create_worker_pool(workers)
+        # Both standard executors know how many workers they run, so use that when it isn't given
+        self.workers :int = workers or getattr(self.executor, '_max_workers', None) or os.cpu_count() or 1
+        self.batchWindow = batchWindow
+        self.batchSize = batchSize
+        self.cacheSize = cacheSize
+        self.cache :OrderedDict[tuple[str,str], Any] = OrderedDict()
+        self.queue :asyncio.Queue[tuple[str, Any, asyncio.Future]] | None = None
+        self.batcher :asyncio.Task | None = None
+        self.running :set[asyncio.Task] = set()
+
+    async def start (self, host:str="127.0.0.1", port:int=8765, *, path:str|None=None) -> asyncio.AbstractServer:
+        "Starts the workers, then listens on `host`:`port`, or on the unix socket `path` if one is given"
+        # Start the workers before any connection is open, which also means the first request doesn't pay for loading the modules
+        await asyncio.get_running_loop().run_in_executor(self.executor, _run_batch, [])
+        self.queue = asyncio.Queue()
+        self.batcher = asyncio.create_task(self._batch_requests())
+        if path is not None:
+            return await asyncio.start_unix_server(self._handle_connection, path)
+        return await asyncio.start_server(self._handle_connection, host, port)
+
+    async def stop (self):
+        if self.batcher is not None:
+            self.batcher.cancel()
+            self.batcher = None
+        self.executor.shutdown(wait=False, cancel_futures=True)
+
+    async def submit (self, method:str, pair:Any) -> Any:
+        "Queues a single request and waits for its result, using the cache when possible"
+        if method not in METHODS:
+            raise ValueError("Unknown method: "+str(method))
+        key = (method, pair if isinstance(pair, str) else json.dumps(pair, sort_keys=True))
+        if key in self.cache:
+            self.cache.move_to_end(key)
+            return self.cache[key]
+        future :asyncio.Future = asyncio.get_running_loop().create_future()
+        await self.queue.put((method, pair, future))
+        result = await future
+        self.cache[key] = result
+        if len(self.cache) > self.cacheSize:
+            self.cache.popitem(last=False)
+        return result
+
+    async def _batch_requests (self):
+        loop = asyncio.get_running_loop()
+        while True:
+            batch = [ await self.queue.get() ]
+            # Only wait for more requests when others are already arriving
+            if not self.queue.empty():
+                deadline = loop.time() + self.batchWindow
+                while len(batch) < self.batchSize and (timeLeft := deadline - loop.time()) > 0:
+                    try: batch.append(await asyncio.wait_for(self.queue.get(), timeLeft))
+                    except asyncio.TimeoutError: break
+            chunkSize = ceil(len(batch) / self.workers)
+            for i in range(0, len(batch), chunkSize):
+                task = loop.create_task(self._run_batch(batch[i:i+chunkSize]))
+                self.running.add(task)
+                task.add_done_callback(self.running.discard)
+
+    async def _run_batch (self, batch:list[tuple[str, Any, asyncio.Future]]):
+        loop = asyncio.get_running_loop()
+        try:
+            results = await loop.run_in_executor(self.executor, _run_batch, [(m, p) for m,p,_ in batch])
+        except Exception as err:
+            results = [(False, f"{type(err).__name__}: {err}")] * len(batch)
+        for (_, _, future), (ok, result) in zip(batch, results):
+            if future.done(): continue
+            if ok: future.set_result(result)
+            else: future.set_exception(RuntimeError(result))
+
+    async def _handle_connection (self, reader:asyncio.StreamReader, writer:asyncio.StreamWriter):
+        pending :set[asyncio.Task] = set()
+        lock = asyncio.Lock()
+        async def answer (request:dict):
+            try:
+                response = {'id': request.get('id'), 'result': await self.submit(request['method'], request['pair'])}
+            except Exception as err:
+                response = {'id': request.get('id'), 'error': str(err)}
+            async with lock:
+                writer.write(json.dumps(response).encode() + b"\n")
+                await writer.drain()
+        try:
+            while line := await reader.readline():
+                try:
+                    request = json.loads(line)
+                except json.JSONDecodeError:
+                    request = None
+                if not isinstance(request, dict):
+                    request = {'method': None, 'pair': None}
+                task = asyncio.create_task(answer(request))
+                pending.add(task)
+                task.add_done_callback(pending.discard)
+            if pending: await asyncio.gather(*pending)
+        finally:
+            writer.close()
+
+def serve (host:str="127.0.0.1", port:int=8765, *, path:str|None=None, workers:int|None=None):
+    "Runs a `SwapService` until interrupted"
+    async def run ():
+        service = SwapService(workers=workers)
+        server = await service.start(host, port, path=path)
+        try:
+            async with server: await server.serve_forever()
+        finally:
+            await service.stop()
+    asyncio.run(run())
+
+def query (method:str, pair:Any, *, host:str="127.0.0.1", port:int=8765, path:str|None=None) -> Any:
+    "Sends a single request to a running `SwapService` and waits for the result, over the unix socket `path` if one is given"
+    conn = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM) if path is not None else socket.create_connection((host, port))
+    with conn:
+        if path is not None: conn.connect(path)
+        conn.sendall(json.dumps({'id': 0, 'method': method, 'pair': pair}).encode() + b"\n")
+        conn.shutdown(socket.SHUT_WR)
+        response = json.loads(conn.makefile('rb').readline())
+    if 'error' in response:
+        raise RuntimeError(response['error'])
+    return response['result']
+
+
+if __name__ == "__main__": serve()
@@ -1,12 +1,26 @@
 
 import unittest
+import asyncio
+import json
+import os
+import tempfile
+import warnings
+import gc
+from concurrent.futures import ThreadPoolExecutor
 from typing import Iterable
-from collections import defaultdict
-from itertools import pairwise, chain
-from GraphIO import load_graphs
+from collections import defaultdict, Counter
+from random import Random
+from itertools import pairwise, chain, islice, cycle
+from time import perf_counter
+from GraphIO import load_graphs, save_checkpoint, load_checkpoint, find_edge_swaps_resumable, get_pair_fingerprint, \
+    save_swap_plan, SwapPlan, replay_swap_plan, replay_swap_plan_edges
 from Graphing import NodeType, construct_graph, get_difference_graph, get_components, \
-    find_alternating_cycles, swap_edges, find_edge_swaps
-from Deprecated import traverse_alternating_graph
+    find_alternating_cycles, swap_edges, find_edge_swaps, IncrementalSwaps, optimize_swaps, get_swap_lower_bound, \
+    find_best_cycle, search_edge_swaps, search_alternating_cycles, generate_realizations, realization_to_graph, \
+    run_switch_chain, sample_realizations, EdgeIndex, get_pairwise_difference_sizes, \
+    CompleteDifferenceView
+from Deprecated import traverse_alternating_graph, get_complete_difference_graph, get_edge_node_graph, get_best_cycles
+from SwapService import SwapService, query
 import networkx as nx
 
 
@@ -98,6 +112,86 @@ class Test_construct_graph (unittest.TestCase):
             "abcdefghijklmnopqrstuvwxyz"
         )
 
+class Test_generate_realizations (unittest.TestCase):
+
+    def standard_test (self, degreeSequence:list[int], count:int=20):
+        realizations = list(generate_realizations(degreeSequence, count, seed=7))
+        self.assertEqual(len(realizations), count)
+        for edges in realizations:
+            G = realization_to_graph(edges, len(degreeSequence))
+            self.assertEqual(G.number_of_edges(), sum(degreeSequence) // 2, "Realization has duplicate edges")
+            self.assertEqual([G.degree(i) for i in range(len(degreeSequence))], degreeSequence)
+            self.assertEqual(nx.number_of_selfloops(G), 0)
+
+    def test_length5 (self): self.standard_test([3, 2, 2, 2, 1])
+
+    def test_weird_degree_order (self): self.standard_test([2, 3, 2, 1, 2])
+
+    def test_complete10 (self): self.standard_test([9] * 10)
+
+    def test_regular (self): self.standard_test([4] * 50)
+
+    def test_invalid (self):
+        with self.assertRaises(ValueError):
+            next(generate_realizations([1, 1, 1], 1))
+
+    def test_reproducible (self):
+        degrees = [3, 3, 2, 2, 2, 1, 1]
+        first = list(generate_realizations(degrees, 10, seed=3))
+        self.assertEqual(first, list(generate_realizations(degrees, 10, seed=3)))
+        self.assertEqual(first, list(generate_realizations(degrees, 10, seed=3, processes=2, chunkSize=3)),
+            "Splitting the work across processes shouldnt change the graphs")
+
+    def test_labels (self):
+        edges = next(generate_realizations([1, 2, 1], 1))
+        G = realization_to_graph(edges, 3, nodeLabels="abcdef")
+        self.assertEqual(set(G.nodes), set("abc"))
+        with self.assertRaises(ValueError):
+            realization_to_graph(edges, 3, nodeLabels=["hello"])
+
+class Test_sample_realizations (unittest.TestCase):
+
+    def assert_realization (self, edges, degreeSequence:list[int]):
+        G = realization_to_graph(edges, len(degreeSequence))
+        self.assertEqual(G.number_of_edges(), sum(degreeSequence) // 2, "Realization has duplicate edges")
+        self.assertEqual([G.degree(i) for i in range(len(degreeSequence))], degreeSequence)
+        self.assertEqual(nx.number_of_selfloops(G), 0)
+
+    def test_switch_chain (self):
+        degrees = [3] * 40
+        edges = next(generate_realizations(degrees, 1, seed=1))
+        start = list(edges)
+        accepted = run_switch_chain(edges, len(degrees), 2000, Random(1))
+        self.assertGreater(accepted, 0)
+        self.assertNotEqual(start, list(edges))
+        self.assert_realization(edges, degrees)
+
+    def test_degrees_kept (self):
+        degrees = [5, 4, 4, 3, 3, 2, 2, 2, 1]
+        for edges in sample_realizations(degrees, 20, seed=2):
+            self.assert_realization(edges, degrees)
+
+    def test_reproducible (self):
+        degrees = [3] * 12
+        first = list(sample_realizations(degrees, 8, seed=4, chains=2))
+        self.assertEqual(len(first), 8)
+        self.assertEqual(first, list(sample_realizations(degrees, 8, seed=4, chains=2, processes=2)),
+            "Running the chains in parallel shouldnt change the graphs")
+
+    def test_uniform (self):
+        # The degree sequence [1,1,1,1] has exactly three realizations
+        counts = Counter(
+            frozenset(frozenset(e) for e in zip(edges[::2], edges[1::2]))
+            for edges in sample_realizations([1, 1, 1, 1], 3000, seed=5, thinning=5)
+        )
+        self.assertEqual(len(counts), 3)
+        for count in counts.values():
+            self.assertTrue(850 < count < 1150, f"Samples should be close to uniform, got {counts}")
+
+    def test_invalid (self):
+        with self.assertRaises(ValueError):
+            next(sample_realizations([3, 1], 1))
+
 class Test_get_components (unittest.TestCase):
 
     def standard_test (self, G:nx.Graph, expected:list[set[NodeType]]):
@@ -142,6 +236,50 @@ class Test_get_components (unittest.TestCase):
             set(range(6)), set(range(6,16)), set(range(16,20)), set(range(20,25))
         ])
 
+class Test_EdgeIndex (unittest.TestCase):
+
+    def coloured_edges (self, DG:nx.Graph) -> set:
+        return {(frozenset((u, v)), c) for u,v,c in DG.edges.data('color')}
+
+    def test_matches_difference_graph (self):
+        for name in ("Square", "Same", "TwoComponents", "Len26Dense", "Len26Medium"):
+            with self.subTest(name=name):
+                G1, G2 = load_graphs(name)
+                expected = get_difference_graph(G1, G2)
+                actual = EdgeIndex(G1).difference_graph(G2)
+                self.assertEqual(set(expected.nodes), set(actual.nodes))
+                self.assertEqual(self.coloured_edges(expected), self.coloured_edges(actual))
+
+    def test_many_candidates (self):
+        degrees = [3] * 30
+        G1, *candidates = [realization_to_graph(e, 30) for e in generate_realizations(degrees, 9, seed=1)]
+        index = EdgeIndex(G1)
+        serial = list(index.differences(candidates))
+        self.assertEqual(serial, list(index.differences(candidates, processes=2, chunkSize=2)))
+        for G2, (red, blue) in zip(candidates, serial):
+            DG = get_difference_graph(G1, G2)
+            self.assertEqual({frozenset(e) for e in red}, {frozenset(e) for e in DG.edges if DG.edges[e]['color'] == 'red'})
+            self.assertEqual({frozenset(e) for e in blue}, {frozenset(e) for e in DG.edges if DG.edges[e]['color'] == 'blue'})
+
+    def test_endless_candidates (self):
+        degrees = [3] * 30
+        G1, *candidates = [realization_to_graph(e, 30) for e in generate_realizations(degrees, 4, seed=2)]
+        index = EdgeIndex(G1)
+        # Only as many candidates as are needed should be read, so an endless stream still yields
+        firstTen = list(islice(index.differences(cycle(candidates), processes=2, chunkSize=2), 10))
+        self.assertEqual(firstTen, list(islice(index.differences(cycle(candidates)), 10)))
+
+    def test_pairwise_sizes (self):
+        graphs = [realization_to_graph(e, 20) for e in generate_realizations([4] * 20, 5, seed=2)]
+        sizes = get_pairwise_difference_sizes(graphs)
+        for i, Gi in enumerate(graphs):
+            for j, Gj in enumerate(graphs):
+                self.assertEqual(sizes[i][j], get_difference_graph(Gi, Gj).number_of_edges())
+
+    def test_unknown_node (self):
+        with self.assertRaises(ValueError):
+            EdgeIndex(nx.path_graph(3)).difference(nx.path_graph(4))
+
 class Test_traverse_alternating_cycle (unittest.TestCase):
 
     def standard_test (self, name:str, expected:Iterable[NodeType]):
@@ -320,6 +458,566 @@ class Test_find_edge_swaps (unittest.TestCase):
     #             G1, G2 = load_graphs(graph)
     #             self.standard_test(G1, G2)
 
+class Test_find_edge_swaps_in_place (unittest.TestCase):
+
+    def adjacency (self, G:nx.Graph) -> list:
+        "Every node's neighbours and edge data, in order"
+        return [(n, list(G.adj[n].items())) for n in G]
+
+    def standard_test (self, name:str):
+        G1, G2 = load_graphs(name)
+        before = self.adjacency(G1)
+        expected = find_edge_swaps(G1, G2)
+        swaps = find_edge_swaps(G1, G2, inPlace=True)
+        self.assertEqual(before, self.adjacency(G1), "G1 should be restored exactly after an in place search")
+        self.assertEqual(swaps, expected, "An in place search should find the same swaps")
+        self.assertEqual(find_edge_swaps(G1, G2), expected, "Searching again after an in place search should find the same swaps")
+        for e1, e2 in swaps:
+            swap_edges(G1, e1, e2)
+        self.assertEqual(G1.edges, G2.edges, "After applying the edge swaps, G1 and G2 should now be the same")
+
+    def test_hexagon (self): self.standard_test("Hexagon")
+
+    def test_bird (self): self.standard_test("Bird")
+
+    def test_len26_medium (self): self.standard_test("Len26Medium")
+
+    def test_len26_heavytail (self): self.standard_test("Len26HeavyTail")
+
+    def test_shuffled_target (self):
+        for name in ("Len26Medium", "Len26HeavyTail"):
+            G1, _G2 = load_graphs(name)
+            for seed in range(5):
+                with self.subTest(name=name, seed=seed):
+                    # The same target, but with its nodes and edges listed in a different order than G1's
+                    rng = Random(seed)
+                    nodes, edges = list(_G2.nodes), list(_G2.edges)
+                    rng.shuffle(nodes)
+                    rng.shuffle(edges)
+                    G2 = nx.Graph()
+                    G2.add_nodes_from(nodes)
+                    G2.add_edges_from(edges)
+                    before = self.adjacency(G1)
+                    self.assertEqual(find_edge_swaps(G1, G2, inPlace=True), find_edge_swaps(G1, G2))
+                    self.assertEqual(before, self.adjacency(G1))
+
+    def test_restored_on_error (self):
+        G1, G2 = load_graphs("Len26Medium")
+        G2.remove_edge(*list(G2.edges)[-1])
+        G2.remove_edge(*list(G2.edges)[5])
+        before = self.adjacency(G1)
+        with self.assertRaises(RuntimeError):
+            find_edge_swaps(G1, G2, inPlace=True)
+        self.assertEqual(before, self.adjacency(G1), "G1 should be restored even when the search fails")
+
+class Test_search_edge_swaps (unittest.TestCase):
+
+    def test_resume_matches (self):
+        for name in ("Hexagon", "Bird", "Len26Medium"):
+            G1, G2 = load_graphs(name)
+            expected = find_edge_swaps(G1, G2)
+            for steps in (0, 1, len(expected) // 2):
+                with self.subTest(name=name, steps=steps):
+                    partial = search_edge_swaps(G1, G2, maxIterations=steps)
+                    self.assertEqual(len(partial.swaps) + len(partial.deferred), steps)
+                    self.assertEqual(partial.complete, steps >= len(expected))
+                    self.assertEqual(search_edge_swaps(G1, G2, resume=partial).plan(), expected,
+                        "Resuming a partial search should give the same swaps as an uninterrupted one")
+
+    def test_cancel_and_progress (self):
+        G1, G2 = load_graphs("Len26Medium")
+        reports = []
+        partial = search_edge_swaps(G1, G2, cancel=lambda: len(reports) >= 5,
+            progress=lambda remaining, emitted: reports.append((remaining, emitted)))
+        self.assertEqual([emitted for _, emitted in reports], [1, 2, 3, 4, 5])
+        self.assertEqual(reports[-1][0], partial.remaining.number_of_edges())
+        self.assertFalse(partial.complete)
+        # The swaps so far can already be applied to G1
+        G = G1.copy()
+        for e1, e2 in partial.swaps:
+            swap_edges(G, e1, e2)
+        for e1, e2 in search_edge_swaps(G1, G2, resume=partial, inPlace=True).plan():
+            swap_edges(G1, e1, e2)
+        self.assertEqual(G1.edges, G2.edges)
+
+    def test_time_budget (self):
+        G1, G2 = load_graphs("Len26Medium")
+        partial = search_edge_swaps(G1, G2, timeBudget=0)
+        self.assertEqual(partial.swaps, [])
+        self.assertEqual(partial.remaining.number_of_edges(), get_difference_graph(G1, G2).number_of_edges())
+
+    def test_alternating_cycles_resume (self):
+        G1, G2 = load_graphs("Len26Medium")
+        DG = get_difference_graph(G1, G2)
+        reports = []
+        partial = search_alternating_cycles(G1, G2, maxIterations=DG.number_of_edges() // 2,
+            progress=lambda remaining, found: reports.append(remaining))
+        self.assertFalse(partial.complete)
+        # Edges of the unfinished cycle are handed back too
+        self.assertGreaterEqual(partial.remaining.number_of_edges(), reports[-1])
+        result = search_alternating_cycles(G1, G2, resume=partial)
+        self.assertTrue(result.complete)
+        edges = [frozenset(e) for cycle in result.cycles for e in pairwise(cycle + cycle[:1])]
+        self.assertEqual(len(edges), len(set(edges)), "No difference edge should be used twice")
+        self.assertEqual(set(edges), {frozenset(e) for e in DG.edges})
+
+class Test_checkpoints (unittest.TestCase):
+
+    def test_resume_after_restart (self):
+        for name in ("Bird", "Len26HeavyTail", "Len26Medium"):
+            G1, G2 = load_graphs(name)
+            expected = find_edge_swaps(G1, G2)
+            with self.subTest(name=name), tempfile.TemporaryDirectory() as folder:
+                path = os.path.join(folder, "search.ckpt")
+                fingerprint = get_pair_fingerprint(G1, G2)
+                # Pretend the worker was stopped part way, after checkpointing every step
+                # The search keeps working on the same objects, so remember what each checkpoint held at the time
+                snapshots = []
+                def snapshot (progress):
+                    return list(progress.swaps), list(progress.deferred), \
+                        [(n, list(progress.remaining.adj[n].items())) for n in progress.remaining]
+                def checkpoint (progress):
+                    snapshots.append(snapshot(progress))
+                    save_checkpoint(progress, path, fingerprint=fingerprint, nodeLabels=list(G1.nodes))
+                search_edge_swaps(G1, G2, maxIterations=len(expected) // 2, checkpointInterval=0, checkpoint=checkpoint)
+                saved = load_checkpoint(path, fingerprint=fingerprint)
+                self.assertLessEqual(len(saved.swaps) + len(saved.deferred), len(expected) // 2)
+                self.assertEqual(snapshot(saved), snapshots[-1],
+                    "A checkpoint should load back the same swaps, and the remaining graph in the same order")
+                self.assertEqual(find_edge_swaps_resumable(G1, G2, path), expected,
+                    "Resuming from a checkpoint should give the same swaps as an uninterrupted run")
+                self.assertFalse(os.path.exists(path), "Checkpoint should be removed once the search is done")
+
+    def test_no_checkpoint (self):
+        G1, G2 = load_graphs("Hexagon")
+        with tempfile.TemporaryDirectory() as folder:
+            path = os.path.join(folder, "search.ckpt")
+            self.assertEqual(find_edge_swaps_resumable(G1, G2, path), find_edge_swaps(G1, G2))
+
+    def test_different_pair (self):
+        G1, G2 = load_graphs("Len26Medium")
+        with tempfile.TemporaryDirectory() as folder:
+            path = os.path.join(folder, "search.ckpt")
+            search_edge_swaps(G1, G2, maxIterations=3, checkpointInterval=0,
+                checkpoint=lambda progress: save_checkpoint(progress, path,
+                    fingerprint=get_pair_fingerprint(G1, G2), nodeLabels=list(G1.nodes)))
+            with self.assertRaises(ValueError):
+                find_edge_swaps_resumable(G1, G1.copy(), path)
+            self.assertTrue(os.path.exists(path), "A checkpoint for another pair should be left alone")
+
+    def test_corrupt_checkpoint (self):
+        G1, G2 = load_graphs("Len26Medium")
+        fingerprint = get_pair_fingerprint(G1, G2)
+        with tempfile.TemporaryDirectory() as folder:
+            path = os.path.join(folder, "search.ckpt")
+            search_edge_swaps(G1, G2, maxIterations=5, checkpointInterval=0,
+                checkpoint=lambda progress: save_checkpoint(progress, path, fingerprint=fingerprint, nodeLabels=list(G1.nodes)))
+            with open(path, 'rb') as fin:
+                data = fin.read()
+            corrupt = {
+                'truncated': data[:len(data) - 8],
+                'header only': data[:80],
+                'bad position': data[:-8] + (10**6).to_bytes(4, 'little') + data[-4:],
+            }
+            for name, content in corrupt.items():
+                with self.subTest(name=name):
+                    with open(path, 'wb') as fout:
+                        fout.write(content)
+                    with self.assertRaises(ValueError):
+                        load_checkpoint(path)
+
+    def test_leftover_temporary_file (self):
+        G1, G2 = load_graphs("Hexagon")
+        with tempfile.TemporaryDirectory() as folder:
+            path = os.path.join(folder, "search.ckpt")
+            # As if a run crashed while writing its checkpoint
+            with open(path + ".tmp", 'wb') as fout:
+                fout.write(b"SWAPCKP2 half written")
+            self.assertEqual(find_edge_swaps_resumable(G1, G2, path), find_edge_swaps(G1, G2))
+            self.assertEqual(os.listdir(folder), [])
+
+class Test_swap_plan (unittest.TestCase):
+
+    def test_round_trip (self):
+        for name in ("Same", "Hexagon", "Len26Medium"):
+            G1, G2 = load_graphs(name)
+            swaps = find_edge_swaps(G1, G2)
+            with self.subTest(name=name), tempfile.TemporaryDirectory() as folder:
+                path = save_swap_plan(swaps, os.path.join(folder, "plan.swaps"))
+                with SwapPlan(path) as plan:
+                    self.assertEqual(len(plan), len(swaps))
+                    self.assertEqual([plan[i] for i in range(len(plan))], swaps)
+                    half = len(plan) // 2
+                    replay_swap_plan(G1, plan, 0, half)
+                    replay_swap_plan(G1, plan, half)
+                self.assertEqual(G1.edges, G2.edges, "Replaying the plan should turn G1 into G2")
+
+    def test_replay_edges (self):
+        edges1, edges2 = generate_realizations([3] * 30, 2, seed=3)
+        G1, G2 = realization_to_graph(edges1, 30), realization_to_graph(edges2, 30)
+        with tempfile.TemporaryDirectory() as folder:
+            path = save_swap_plan(find_edge_swaps(G1, G2), os.path.join(folder, "plan.swaps"), nodeLabels=range(30))
+            with SwapPlan(path) as plan:
+                replay_swap_plan_edges(edges1, 30, plan)
+                self.assertEqual(realization_to_graph(edges1, 30).edges, G2.edges)
+                with self.assertRaises(ValueError):
+                    replay_swap_plan_edges(edges1, 30, plan)
+
+    def test_replay_edges_any_labels (self):
+        edges1, edges2 = generate_realizations([3] * 30, 2, seed=4)
+        G1, G2 = realization_to_graph(edges1, 30), realization_to_graph(edges2, 30)
+        with tempfile.TemporaryDirectory() as folder:
+            # Without nodeLabels the label table lists nodes in the order the swaps use them, not by index
+            path = save_swap_plan(find_edge_swaps(G1, G2), os.path.join(folder, "plan.swaps"))
+            with SwapPlan(path) as plan:
+                self.assertNotEqual(plan.labels, list(range(len(plan.labels))))
+                replay_swap_plan_edges(edges1, 30, plan)
+                self.assertEqual(realization_to_graph(edges1, 30).edges, G2.edges)
+            path = save_swap_plan([(('a','b'), ('c','d'))], os.path.join(folder, "named.swaps"))
+            with SwapPlan(path) as plan, self.assertRaises(ValueError):
+                replay_swap_plan_edges(edges1, 30, plan)
+
+    def test_not_a_plan (self):
+        with tempfile.TemporaryDirectory() as folder:
+            path = os.path.join(folder, "plan.swaps")
+            valid = save_swap_plan(find_edge_swaps(*load_graphs("Hexagon")), os.path.join(folder, "valid.swaps"))
+            with open(valid, 'rb') as fin: data = fin.read()
+            for name, content in (("zeros", b"\0" * 64), ("empty", b""), ("short", b"SWAPPLN1"), ("truncated", data[:-4])):
+                with self.subTest(name=name):
+                    with open(path, 'wb') as fout: fout.write(content)
+                    with warnings.catch_warnings(record=True) as caught:
+                        warnings.simplefilter("always", ResourceWarning)
+                        with self.assertRaises(ValueError):
+                            SwapPlan(path)
+                        gc.collect()
+                    self.assertEqual([w for w in caught if issubclass(w.category, ResourceWarning)], [],
+                        "The file should be closed when it isn't a swap plan")
+
+class Test_IncrementalSwaps (unittest.TestCase):
+
+    def assert_swaps_valid (self, G1:nx.Graph, G2:nx.Graph, swaps):
+        G = G1.copy()
+        for e1, e2 in swaps:
+            self.assertTrue(G.has_edge(*e1) and G.has_edge(*e2), "Swap removes an edge that doesnt exist")
+            self.assertFalse(G.has_edge(e1[0], e2[0]) or G.has_edge(e1[1], e2[1]), "Swap adds an edge that already exists")
+            swap_edges(G, e1, e2)
+        self.assertEqual(G.edges, G2.edges, "Swaps should turn G1 into G2")
+
+    def find_edit (self, G:nx.Graph, avoid:set=set()):
+        "Returns some valid edge swap within `G`, using no nodes from `avoid`"
+        edges = [e for e in G.edges if not avoid.intersection(e)]
+        for i, e1 in enumerate(edges):
+            for e2 in edges[i+1:]:
+                if len({*e1, *e2}) == 4 and not G.has_edge(e1[0], e2[0]) and not G.has_edge(e1[1], e2[1]):
+                    return e1, e2
+        return None
+
+    def standard_test (self, name:str):
+        G1, G2 = load_graphs(name)
+        inc = IncrementalSwaps(G1, G2)
+        self.assert_swaps_valid(G1, G2, inc.swaps)
+        for _ in range(3):
+            edit = self.find_edit(inc.G2)
+            inc.update([edit])
+            swap_edges(G2, *edit)
+            self.assert_swaps_valid(G1, G2, inc.swaps)
+
+    def test_square (self): self.standard_test("Square")
+
+    def test_two_components (self): self.standard_test("TwoComponents")
+
+    def test_len26_medium (self): self.standard_test("Len26Medium")
+
+    def test_same (self): self.standard_test("Same")
+
+    def test_untouched_components_kept (self):
+        G1 = nx.Graph([(0,1), (2,3), (10,11), (12,13), (20,21), (22,23), (24,25)])
+        G2 = nx.Graph([(0,2), (1,3), (10,12), (11,13), (20,21), (22,23), (24,25)])
+        inc = IncrementalSwaps(G1, G2)
+        kept = [plan for plan in inc.plans.values() if 0 in plan[0][0]][0]
+        inc.update([((20,21), (22,23))])
+        self.assertTrue(any(plan is kept for plan in inc.plans.values()),
+            "The plan of a component that wasnt edited should be reused")
+        swap_edges(G2, (20,21), (22,23))
+        self.assert_swaps_valid(G1, G2, inc.swaps)
+
+    def test_invalid_edit (self):
+        G1, G2 = load_graphs("Square")
+        inc = IncrementalSwaps(G1, G2)
+        with self.assertRaises(ValueError):
+            inc.update([(('a','z'), ('b','c'))])
+
+    def test_invalid_edit_in_batch (self):
+        G1, G2 = load_graphs("Len26Medium")
+        inc = IncrementalSwaps(G1, G2)
+        before = inc.swaps
+        edit = self.find_edit(inc.G2)
+        with self.assertRaises(ValueError):
+            inc.update([edit, (('zz','yy'), ('a','b'))])
+        self.assertEqual(inc.swaps, before, "A batch with an invalid edit should change nothing")
+        self.assert_swaps_valid(G1, G2, inc.swaps)
+        self.assertEqual({frozenset(e) for e in inc.DG.edges}, {frozenset(e) for e in get_difference_graph(G1, G2).edges})
+
+    def test_edits_depend_on_earlier_edits (self):
+        G1, G2 = load_graphs("Len26Medium")
+        inc = IncrementalSwaps(G1, G2)
+        (a, b), (c, d) = self.find_edit(inc.G2)
+        # The second edit removes the edges the first one adds, which puts G2 back as it was
+        inc.update([((a, b), (c, d)), ((a, c), (b, d))])
+        self.assert_swaps_valid(G1, G2, inc.swaps)
+
+class Test_optimize_swaps (unittest.TestCase):
+
+    def apply_swaps (self, G:nx.Graph, swaps) -> nx.Graph:
+        G = G.copy()
+        for e1, e2 in swaps:
+            self.assertTrue(G.has_edge(*e1) and G.has_edge(*e2), "Swap removes an edge that doesnt exist")
+            self.assertFalse(G.has_edge(e1[0], e2[0]) or G.has_edge(e1[1], e2[1]), "Swap adds an edge that already exists")
+            swap_edges(G, e1, e2)
+        return G
+
+    def standard_test (self, G1:nx.Graph, G2:nx.Graph, swaps, expectedLength:int):
+        optimized, reduction = optimize_swaps(swaps)
+        self.assertEqual(len(optimized), expectedLength)
+        self.assertEqual(reduction, len(swaps) - len(optimized))
+        self.assertGreaterEqual(len(optimized), get_swap_lower_bound(G1, G2))
+        self.assertEqual(self.apply_swaps(G1, optimized).edges, G2.edges, "Optimized swaps should still turn G1 into G2")
+
+    def test_cancelling_pair (self):
+        G1, G2 = load_graphs("Hexagon")
+        swaps = find_edge_swaps(G1, G2)
+        # Swap an unrelated pair of edges back and forth part way through
+        G = self.apply_swaps(G1, swaps[:1])
+        (a, b), (c, d) = next(
+            (e1, e2) for e1 in G.edges for e2 in G.edges
+            if len({*e1, *e2}) == 4 and not G.has_edge(e1[0], e2[0]) and not G.has_edge(e1[1], e2[1])
+        )
+        padded = swaps[:1] + [((a,b), (c,d)), ((a,c), (b,d))] + swaps[1:]
+        self.assertEqual(self.apply_swaps(G1, padded).edges, G2.edges)
+        self.standard_test(G1, G2, padded, len(swaps))
+
+    def test_merge (self):
+        G1 = nx.Graph([('a','b'), ('c','d'), ('b','y')])
+        G2 = nx.Graph([('a','b'), ('b','d'), ('c','y')])
+        self.standard_test(G1, G2, [(('a','b'), ('c','d')), (('a','c'), ('b','y'))], 1)
+
+    def test_already_short (self):
+        for name in ("Square", "Hexagon", "Len26Sparse"):
+            with self.subTest(name=name):
+                G1, G2 = load_graphs(name)
+                swaps = find_edge_swaps(G1, G2)
+                optimized, _ = optimize_swaps(swaps)
+                self.assertLessEqual(len(optimized), len(swaps))
+                self.assertEqual(self.apply_swaps(G1, optimized).edges, G2.edges)
+
+    def test_intermediate_edges (self):
+        # Most of this plan's swaps add an edge that a later swap removes again, with other swaps in between
+        G1, G2 = load_graphs("Len26Medium")
+        swaps = find_edge_swaps(G1, G2)
+        for given in (None, G1):
+            with self.subTest(G1=given is not None):
+                optimized, reduction = optimize_swaps(swaps, given)
+                self.assertGreater(reduction, len(swaps) // 5)
+                self.assertGreaterEqual(len(optimized), get_swap_lower_bound(G1, G2))
+                self.assertEqual(self.apply_swaps(G1, optimized).edges, G2.edges)
+
+    def test_with_G1 (self):
+        degrees = [4] * 200
+        for seed in range(3):
+            with self.subTest(seed=seed):
+                G1, G2 = [realization_to_graph(e, 200) for e in sample_realizations(degrees, 2, seed=seed)]
+                swaps = find_edge_swaps(G1, G2)
+                optimized, reduction = optimize_swaps(swaps, G1)
+                self.assertGreater(reduction, len(swaps) // 10, "Replanning with G1 should find many shorter cycles")
+                self.assertGreaterEqual(len(optimized), get_swap_lower_bound(G1, G2))
+                self.assertEqual(set(map(frozenset, self.apply_swaps(G1, optimized).edges)), set(map(frozenset, G2.edges)))
+
+    def test_empty (self): self.assertEqual(optimize_swaps([]), ([], 0))
+
+class Test_find_best_cycle (unittest.TestCase):
+
+    def assert_valid_cycle (self, G1:nx.Graph, G2:nx.Graph, cost:int, cycle:list[NodeType]):
+        CDG = get_complete_difference_graph(G1, G2)
+        edges = list(pairwise(cycle + cycle[:1]))
+        self.assertEqual(len(edges), len({frozenset(e) for e in edges}), "Cycle reuses an edge")
+        for (u1,v1), (_,v2) in pairwise(edges + edges[:1]):
+            self.assertNotEqual(CDG[u1][v1]['color'], CDG[v1][v2]['color'], "Cycle doesnt alternate colours")
+        self.assertEqual(cost, sum(CDG[u][v]['weight'] for u,v in edges))
+
+    def standard_test (self, G1:nx.Graph, G2:nx.Graph):
+        cost, cycle = find_best_cycle(G1, G2)
+        self.assert_valid_cycle(G1, G2, cost, cycle)
+        expectedCost, _ = get_best_cycles(get_edge_node_graph(get_complete_difference_graph(G1, G2)))
+        self.assertEqual(cost, expectedCost)
+
+    def test_square (self): self.standard_test(*load_graphs("Square"))
+
+    def test_hourglass (self): self.standard_test(*load_graphs("Hourglass"))
+
+    def test_hexagon (self): self.standard_test(*load_graphs("Hexagon"))
+
+    def test_two_components (self):
+        G1 = nx.Graph([(0,1), (2,3), (4,5), (6,7), (1,5)])
+        G2 = nx.Graph([(0,2), (1,3), (4,6), (5,7), (1,5)])
+        self.standard_test(G1, G2)
+
+    def test_through_unchanged_nodes (self):
+        # The best cycle takes dashed edges through nodes that have no solid edges at all
+        G1 = nx.Graph([(0,1), (2,3), (4,5), (6,7), (8,9)])
+        G2 = nx.Graph([(0,2), (1,3), (4,6), (5,7), (8,9)])
+        self.standard_test(G1, G2)
+        self.assertEqual(find_best_cycle(G1, G2)[0], -4)
+
+    def test_same (self):
+        self.assertEqual(find_best_cycle(*load_graphs("Same")), (0, []))
+
+    def test_time_budget (self):
+        G1 = construct_graph([4]*300)
+        G2 = construct_graph([4]*300)
+        start = perf_counter()
+        cost, cycle = find_best_cycle(G1, G2, timeBudget=0.5)
+        self.assertLess(perf_counter() - start, 5, "Search should stop soon after its time budget")
+        self.assert_valid_cycle(G1, G2, cost, cycle)
+
+class Test_CompleteDifferenceView (unittest.TestCase):
+
+    def standard_test (self, name:str):
+        G1, G2 = load_graphs(name)
+        CDG = get_complete_difference_graph(G1, G2)
+        view = CompleteDifferenceView(G1, G2)
+        self.assertEqual(set(view), set(CDG.nodes))
+        self.assertEqual(view.solid.number_of_edges(), get_difference_graph(G1, G2).number_of_edges())
+        for u in CDG.nodes:
+            self.assertEqual(set(view.neighbors(u)), set(CDG.neighbors(u)))
+            for v in CDG.neighbors(u):
+                self.assertEqual(view.edge(u, v), CDG.edges[u, v], f"Edge ({u},{v}) differs")
+        ENG = get_edge_node_graph(CDG)
+        for edge in ENG.nodes:
+            self.assertEqual(set(view.edge_node_successors(edge)), set(ENG.successors(edge)))
+
+    def test_square (self): self.standard_test("Square")
+
+    def test_same (self): self.standard_test("Same")
+
+    def test_hexagon (self): self.standard_test("Hexagon")
+
+    def test_two_components (self): self.standard_test("TwoComponents")
+
+class Test_SwapService (unittest.TestCase):
+
+    def run_requests (self, requests:list, *, processes:bool=False) -> dict:
+        """Starts a service, sends all `requests` down one connection, and returns a map of id -> response.
+        Responses are read until the service closes the connection."""
+        async def run ():
+            service = SwapService() if processes else SwapService(executor=ThreadPoolExecutor(2))
+            server = await service.start(port=0)
+            port = server.sockets[0].getsockname()[1]
+            reader, writer = await asyncio.open_connection("127.0.0.1", port)
+            for request in requests:
+                writer.write(json.dumps(request).encode() + b"\n")
+            writer.write_eof()
+            async def read_all (): return [json.loads(line) async for line in reader]
+            responses = await asyncio.wait_for(read_all(), 30)
+            writer.close()
+            server.close()
+            await service.stop()
+            return {r['id']: r for r in responses}
+        return asyncio.run(run())
+
+    def test_methods (self):
+        responses = self.run_requests([
+            {'id': 1, 'method': 'get_difference_graph', 'pair': 'Square'},
+            {'id': 2, 'method': 'find_alternating_cycles', 'pair': 'Square'},
+            {'id': 3, 'method': 'find_edge_swaps', 'pair': 'Square'},
+        ])
+        G1, G2 = load_graphs("Square")
+        self.assertEqual(len(responses), 3)
+        self.assertEqual(
+            sorted(tuple(e) for e in responses[1]['result']['edges']),
+            sorted(get_difference_graph(G1, G2).edges.data('color'))
+        )
+        self.assertEqual(responses[2]['result'], find_alternating_cycles(G1, G2))
+        for e1, e2 in responses[3]['result']:
+            swap_edges(G1, e1, e2)
+        self.assertEqual(G1.edges, G2.edges, "Swaps returned by the service should turn G1 into G2")
+
+    def test_inline_graphs (self):
+        pair = [
+            {'nodes': [0,1,2,3], 'edges': [[0,1],[2,3]]},
+            {'nodes': [0,1,2,3], 'edges': [[0,2],[1,3]]},
+        ]
+        responses = self.run_requests([{'id': i, 'method': 'find_edge_swaps', 'pair': pair} for i in range(5)])
+        self.assertEqual(len(responses), 5)
+        for response in responses.values():
+            self.assertEqual(len(response['result']), 1)
+
+    def test_bad_request (self):
+        responses = self.run_requests([
+            {'id': 'a', 'method': 'not_a_method', 'pair': 'Square'},
+            {'id': 'b', 'method': 'find_edge_swaps', 'pair': 'NotAGraph'},
+        ])
+        self.assertIn('error', responses['a'])
+        self.assertIn('error', responses['b'])
+
+    def test_request_not_an_object (self):
+        responses = self.run_requests([[1, 2], "text", {'id': 1, 'method': 'find_edge_swaps', 'pair': 'Square'}])
+        self.assertEqual(len(responses[1]['result']), 1, "Later requests should still be answered")
+        self.assertIn('error', responses[None])
+
+    def test_process_pool (self):
+        responses = self.run_requests([
+            {'id': i, 'method': 'find_edge_swaps', 'pair': name}
+            for i, name in enumerate(("Square", "Hexagon", "Bird"))
+        ], processes=True)
+        self.assertEqual(len(responses), 3)
+        for i, name in enumerate(("Square", "Hexagon", "Bird")):
+            G1, G2 = load_graphs(name)
+            for e1, e2 in responses[i]['result']:
+                swap_edges(G1, e1, e2)
+            self.assertEqual(G1.edges, G2.edges)
+
+    def test_lone_request_not_delayed (self):
+        async def run ():
+            service = SwapService(executor=ThreadPoolExecutor(2), batchWindow=5)
+            server = await service.start(port=0)
+            start = perf_counter()
+            await service.submit('find_edge_swaps', 'Square')
+            elapsed = perf_counter() - start
+            server.close()
+            await service.stop()
+            return elapsed
+        self.assertLess(asyncio.run(run()), 2, "A request with none others waiting shouldn't wait for the batch window")
+
+    def test_batch_split_across_workers (self):
+        batchSizes = []
+        class CountingExecutor (ThreadPoolExecutor):
+            def submit (self, fn, *args):
+                if args and args[0]: batchSizes.append(len(args[0]))
+                return super().submit(fn, *args)
+        async def run ():
+            service = SwapService(executor=CountingExecutor(2), batchWindow=0.5)
+            server = await service.start(port=0)
+            await asyncio.gather(*(service.submit('find_edge_swaps', name) for name in ("Square", "Hexagon", "Bird", "Same")))
+            server.close()
+            await service.stop()
+        asyncio.run(run())
+        self.assertEqual(sorted(batchSizes), [2, 2], "Four concurrent requests should be split evenly across two workers")
+
+    def test_query_unix_socket (self):
+        async def run (path:str):
+            service = SwapService(executor=ThreadPoolExecutor(2))
+            server = await service.start(path=path)
+            result = await asyncio.to_thread(query, 'find_edge_swaps', 'Square', path=path)
+            server.close()
+            await service.stop()
+            return result
+        with tempfile.TemporaryDirectory() as folder:
+            swaps = asyncio.run(run(os.path.join(folder, "swaps.sock")))
+        G1, G2 = load_graphs("Square")
+        for e1, e2 in swaps:
+            swap_edges(G1, e1, e2)
+        self.assertEqual(G1.edges, G2.edges)
+
 
 if __name__ == "__main__":
     unittest.main()